@@ -1,205 +1,585 @@
+import argparse
+from functools import partial
+
 import numpy as np
-import pygame as pg
-from OpenGL.GL import *
-from shapely.geometry import LineString, Point
+
+import tracing
+from geometry import intersect_rays_segments, shadow_area, shadow_strip
+from glbuffers import HistoryBuffer, VertexStream
+from history import RingBuffer
+from lazy import LazyModule
+from recording import FrameArchive, FrameRecorder
+from sampling import ConvergenceStats, RaySampler
+from tracing import RIGHT_WALL, WALL_X, Square, recording_metadata
+
+# Window and GL are only imported once something draws, so headless runs start without them
+pg = LazyModule("pygame")
+gl = LazyModule("OpenGL.GL")
 
 
 class App:
-    def __init__(self):
+    def __init__(self, analytic=False, validate=False, record=None, replay=None, frames=(0, None), retained=True,
+                 sorted_strips=True, merge=True):
         pg.init()
         pg.display.set_mode((500, 500), pg.OPENGL | pg.DOUBLEBUF)
         self.clock = pg.time.Clock()
 
-        glClearColor(0, 0, 0, 1)
-        glOrtho(-10, 10, -10, 10, -1, 1)  # Orthographic projection
+        gl.glClearColor(0, 0, 0, 1)
+        gl.glOrtho(-10, 10, -10, 10, -1, 1)  # Orthographic projection
 
         self.square = Square(side_length=6, center=(0, 0), rotation=30)
-        self.ray_tracer = MonteCarloRayTracer(self.square)
+        self.replay = None  # Recorded steps fed back in place of new rays
+        if replay is not None:
+            archive = FrameArchive(replay)
+            self.square = Square(**archive.metadata["square"])
+            self.replay = archive.frame_range(*frames)
+        self.ray_tracer = MonteCarloRayTracer(self.square, analytic=analytic, retained=retained,
+                                              sorted_strips=sorted_strips, merge=merge)
+        if record is not None:
+            self.ray_tracer.recorder = FrameRecorder(record, metadata=recording_metadata(self.square))
+        self.validate = validate  # Periodically report Monte Carlo error against the exact shadow
 
         self.frame_counter = 0  # To slow down ray spawning
 
-        self.mainLoop()
-
     def mainLoop(self):
         running = True
         while running:
             for event in pg.event.get():
                 if event.type == pg.QUIT:
                     running = False
+                elif event.type == pg.KEYDOWN and event.key == pg.K_v:
+                    # Toggle between GPU-resident history and immediate mode to compare frame times
+                    self.ray_tracer.retained = not self.ray_tracer.retained
+                elif event.type == pg.KEYDOWN and event.key == pg.K_s:
+                    # Switch between the height-sorted mesh and strips in arrival order
+                    self.ray_tracer.sorted_strips = not self.ray_tracer.sorted_strips
 
-            glClear(GL_COLOR_BUFFER_BIT)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
             # Draw square
             self.square.draw()
 
             # Add a new ray every few frames
             if self.frame_counter % 10 == 0:  # Slow down ray spawning
-                self.ray_tracer.add_ray()
+                if self.replay is not None:
+                    step = next(self.replay, None)
+                    if step is not None:
+                        self.ray_tracer.replay_step(step)
+                else:
+                    self.ray_tracer.add_ray()
 
             # Draw rays and triangles
             self.ray_tracer.draw_rays()
             self.ray_tracer.draw_triangles()
 
+            if self.validate and self.frame_counter % 60 == 0:
+                print(self.ray_tracer.format_shadow_error())
+
             pg.display.flip()
             self.clock.tick(60)  # 60 FPS
             self.frame_counter += 1
 
+        if self.ray_tracer.recorder is not None:
+            self.ray_tracer.recorder.close()
         self.quit()
 
     def quit(self):
+        if pg.get_init():
+            self.ray_tracer.delete_buffers()
         pg.quit()
 
 
-class Square:
-    def __init__(self, side_length=6, center=(0, 0), rotation=30):
-        self.side_length = side_length
-        self.center = np.array(center)
-        self.rotation = np.radians(rotation)
-        self.vertices = self.generate_vertices()
-        self.edges = self.get_edges()
-
-    def generate_vertices(self):
-        """Generate square vertices given side length, center, and rotation."""
-        half_side = self.side_length / 2
-        square = np.array([
-            [-half_side, -half_side],
-            [ half_side, -half_side],
-            [ half_side,  half_side],
-            [-half_side,  half_side]
-        ])
-
-        # Rotation matrix
-        rotation_matrix = np.array([
-            [np.cos(self.rotation), -np.sin(self.rotation)],
-            [np.sin(self.rotation), np.cos(self.rotation)]
-        ])
-
-        # Apply rotation and translation
-        rotated_square = (square @ rotation_matrix.T) + self.center
-
-        return rotated_square
-
-    def get_edges(self):
-        """Return Shapely LineStrings for square edges."""
-        return [
-            LineString([self.vertices[i], self.vertices[(i + 1) % 4]])
-            for i in range(4)
-        ]
-
-    def draw(self):
-        """Draw the square using OpenGL."""
-        glColor3f(1, 1, 1)  # White color
-        glBegin(GL_LINE_LOOP)
-        for vertex in self.vertices:
-            glVertex2f(vertex[0], vertex[1])
-        glEnd()
+class StripMesh:
+    """
+    Intersection pairs kept sorted by ray height and drawn as one triangle strip.
+
+    Each new (square hit, backboard hit) pair is inserted at its sorted
+    position, found by binary search, so it only splits the strip quad
+    between its two neighbours instead of zig-zagging back to the last
+    arrival. Interleaving the sorted pairs gives the GL_TRIANGLE_STRIP
+    directly, two triangles per quad and no overdraw.
+
+    With ``merge`` a pair whose hits both lie on the lines through its
+    neighbours' hits is dropped, since the quads on either side of it form
+    one quad. Hits along a straight edge collapse that way, so the mesh
+    stays at a few pairs per silhouette vertex while the covered y-range
+    keeps growing.
+
+    With a ``capacity`` the oldest pairs are evicted once there are more,
+    like the tracer's other histories, so inserts and uploads stay bounded
+    even without merging. ``version`` changes whenever the pairs do, so
+    the strip only needs re-uploading then, and ``changes`` tells how much
+    of it: pairs before the lowest insert or delete keep their vertices.
+
+    :param merge: drop pairs that are collinear with their neighbours
+    :param tolerance: distance from the neighbours' line below which a
+        hit counts as collinear
+    :param capacity: maximum number of pairs kept, None for no limit
+    """
+
+    def __init__(self, merge=True, tolerance=1e-9, capacity=None):
+        self.merge = merge
+        self.tolerance = tolerance
+        self.capacity = capacity
+        self.pairs = np.empty((0, 2, 2))  # (n, 2, 2) pairs in increasing y
+        self.serials = np.empty(0, dtype=np.int64)  # Arrival number of every pair
+        self.inserted = 0  # Pairs inserted over the whole run
+        self.merged = 0  # Pairs dropped as collinear over the whole run
+        self.version = 0
+        self.unchanged = 0  # Leading pairs untouched since the last call to changes()
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def insert(self, hits):
+        """Insert (n, 2, 2) (square hit, backboard hit) pairs at their sorted positions."""
+        hits = np.asarray(hits, dtype=float).reshape(-1, 2, 2)
+        if len(hits) == 0:
+            return
+        if self.capacity is not None:
+            hits = hits[-self.capacity:]
+        serials = self.inserted + np.arange(len(hits))
+        self.inserted += len(hits)
+        order = np.argsort(hits[:, 0, 1], kind="stable")
+        hits, serials = hits[order], serials[order]
+        positions = np.searchsorted(self.pairs[:, 0, 1], hits[:, 0, 1])
+        self.unchanged = min(self.unchanged, positions[0])
+        self.pairs = np.insert(self.pairs, positions, hits, axis=0)
+        self.serials = np.insert(self.serials, positions, serials)
+        self.version += 1
+        if self.merge:
+            inserted = positions + np.arange(len(hits))
+            self._merge(np.concatenate((inserted - 1, inserted, inserted + 1)))
+        if self.capacity is not None and len(self.pairs) > self.capacity:
+            self._evict(len(self.pairs) - self.capacity)
+
+    def _delete(self, indices):
+        """Drop the pairs at sorted ``indices``; return their neighbours' indices afterwards."""
+        if len(indices):
+            self.unchanged = min(self.unchanged, indices.min())
+        self.pairs = np.delete(self.pairs, indices, axis=0)
+        self.serials = np.delete(self.serials, indices)
+        # Each dropped pair's old neighbours now neighbour each other
+        shifted = indices - np.arange(len(indices))
+        return np.concatenate((shifted - 1, shifted))
+
+    def _evict(self, count):
+        """Drop the ``count`` oldest pairs."""
+        oldest = np.sort(np.argpartition(self.serials, count - 1)[:count])
+        neighbours = self._delete(oldest)
+        if self.merge:
+            self._merge(neighbours)
+
+    def _merge(self, candidates):
+        """Drop collinear pairs among ``candidates``, then recheck the neighbours of dropped ones."""
+        while len(candidates):
+            candidates = np.unique(candidates)
+            candidates = candidates[(candidates > 0) & (candidates < len(self.pairs) - 1)]
+            before, pairs, after = self.pairs[candidates - 1], self.pairs[candidates], self.pairs[candidates + 1]
+            chord = after - before
+            offset = pairs - before
+            cross = chord[..., 0] * offset[..., 1] - chord[..., 1] * offset[..., 0]
+            length = np.hypot(chord[..., 0], chord[..., 1])
+            dropped = candidates[np.all(np.abs(cross) <= self.tolerance * length, axis=1)]
+            if len(dropped) == 0:
+                return
+            self.merged += len(dropped)
+            candidates = self._delete(dropped)
+
+    def strip(self):
+        """Return the pairs interleaved as (2n, 2) GL_TRIANGLE_STRIP vertices."""
+        return self.pairs.reshape(-1, 2)
+
+    def changes(self):
+        """Return (first, strip): the strip and its first vertex changed since the last call."""
+        first, self.unchanged = 2 * self.unchanged, len(self.pairs)
+        return first, self.strip()
+
+    def area(self):
+        """Return the area covered by the strip quads."""
+        if len(self.pairs) < 2:
+            return 0.0
+        quads = np.stack((self.pairs[:-1, 0], self.pairs[1:, 0], self.pairs[1:, 1], self.pairs[:-1, 1]), axis=1)
+        x, y = quads[..., 0], quads[..., 1]
+        return float(np.abs(0.5 * np.sum(x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y, axis=1)).sum())
 
 
 class MonteCarloRayTracer:
-    def __init__(self, square):
+    def __init__(self, square, capacity=4096, policy="oldest", analytic=False, sampler=None, seed=None,
+                 retained=True, sorted_strips=True, merge=True):
+        """
+        :param square: occluder the rays are cast against
+        :param capacity: maximum number of rays, hits, triangles and mesh pairs kept
+        :param policy: "oldest" drops the oldest entries once full,
+            "decimate" thins the whole history instead
+        :param analytic: skip sampling and draw the exact shadow instead
+        :param sampler: RaySampler choosing ray origins, uniform by default
+        :param seed: seed for the default sampler
+        :param retained: draw the history from GPU buffers that are only
+            appended to, instead of resubmitting it in immediate mode
+        :param sorted_strips: fill the shadow from a StripMesh of the hits
+            sorted by height, instead of joining hits in arrival order
+        :param merge: let the StripMesh drop collinear pairs
+        """
         self.square = square
-        self.rays = []  # Store all previous rays
-        self.first_intersections = []  # Store rays that hit the square first
-        self.second_intersections = []  # Store intersections with the backboard
-        self.triangles = []  # Store generated triangles
-
-    def generate_parallel_ray(self):
-        """Generate a parallel ray that moves exactly rightward."""
-        origin_x = -10  # Start from the far left
-        origin_y = np.random.uniform(-10, 10)  # Random y-position
-        end_x = 10  # Extend far right
-        end_y = origin_y  # Same y-value for perfect parallelism
-
-        return LineString([(origin_x, origin_y), (end_x, end_y)])
+        self.analytic = analytic
+        self.sampler = sampler if sampler is not None else RaySampler(seed=seed)
+        self.convergence = ConvergenceStats()  # Running Monte Carlo estimates
+        self.recorder = None  # FrameRecorder every stored batch is appended to
+        self.rays = RingBuffer(capacity, (2, 2), policy=policy)  # Store previous rays
+        self.hits = RingBuffer(capacity, (2, 2), policy=policy)  # Store (square, backboard) intersection pairs
+        self.triangles = RingBuffer(capacity, (3, 2), policy=policy)  # Store generated triangles
+        self.retained = retained
+        self.ray_buffer = HistoryBuffer(2)  # GPU copies of the history, synced before drawing
+        self.hit_buffer = HistoryBuffer(2)  # Shared by the hit segments and points
+        self.strip_buffer = HistoryBuffer(6, build=strip_triangles, chained=True)
+        self.sorted_strips = sorted_strips
+        self.mesh = StripMesh(merge=merge, capacity=capacity)  # The latest hits, ordered by height
+        self.mesh_stream = VertexStream()
+        self.mesh_uploaded = None  # Mesh version in mesh_stream
+
+    @property
+    def first_intersections(self):
+        """(n, 2) view of the rays that hit the square first."""
+        return self.hits.view()[:, 0]
+
+    @property
+    def second_intersections(self):
+        """(n, 2) view of the intersections with the backboard."""
+        return self.hits.view()[:, 1]
+
+    def generate_parallel_rays(self, count):
+        """Generate (count, 2, 2) ray segments that move exactly rightward."""
+        _, ymin, _, ymax = self.square.bbox
+        origin_y = self.sampler.sample(count, (ymin, ymax))  # Sampled y-positions
+        rays = np.empty((count, 2, 2))
+        rays[:, 0, 0] = -10  # Start from the far left
+        rays[:, 1, 0] = 10  # Extend far right
+        rays[:, :, 1] = origin_y[:, None]  # Same y-value for perfect parallelism
+        return rays
+
+    def cast_rays(self, count):
+        """
+        Cast a batch of parallel rays and intersect them all at once.
+
+        :return: (rays, square_hits, wall_hits, hit_mask) where rays is
+            (count, 2, 2), the hit arrays are (count, 2) and hit_mask marks
+            rays that hit both the square and the backboard
+        """
+        rays = self.generate_parallel_rays(count)
+        origins = rays[:, 0]
+        directions = rays[:, 1] - rays[:, 0]
+
+        # Closest square intersection and the backboard (x = 10)
+        _, square_hits, square_mask, _ = intersect_rays_segments(origins, directions, self.square.segments)
+        _, wall_hits, wall_mask, _ = intersect_rays_segments(origins, directions, RIGHT_WALL)
+
+        return rays, square_hits, wall_hits, square_mask & wall_mask
 
     def add_ray(self):
         """Generate a new ray, find intersections, and store results."""
-        ray = self.generate_parallel_ray()
-        self.rays.append(ray)
-
-        # Find the closest square intersection
-        closest_intersection = None
-        min_distance = float("inf")
-
-        for edge in self.square.get_edges():
-            intersection = ray.intersection(edge)
-            if intersection and not intersection.is_empty:
-                if isinstance(intersection, Point):
-                    dist = abs(ray.coords[0][0] - intersection.x)
-                    if dist < min_distance:
-                        closest_intersection = intersection
-                        min_distance = dist
-
-        # Find intersection with the right-side screen boundary (x = 10)
-        right_wall = LineString([(10, -10), (10, 10)])
-        right_intersection = ray.intersection(right_wall)
-
-        if closest_intersection and isinstance(right_intersection, Point):
-            # Store intersection points
-            self.first_intersections.append((closest_intersection.x, closest_intersection.y))
-            self.second_intersections.append((right_intersection.x, right_intersection.y))
-
-            # If we have at least two first intersection points, form a triangle
-            if len(self.first_intersections) >= 2:
-                self.triangles.append([
-                    self.first_intersections[-2],  # Previous first intersection
-                    self.first_intersections[-1],  # Current first intersection
-                    self.second_intersections[-2]  # Previous second intersection
-                ])
+        self.add_rays(1)
+
+    def add_rays(self, count):
+        """
+        Cast a batch of rays and store the rays, intersections and triangles.
+
+        :return: the cast_rays() arrays for this batch, or None in analytic mode
+        """
+        if self.analytic:
+            return None  # The exact shadow needs no samples
+
+        rays, square_hits, wall_hits, hit_mask = self.cast_rays(count)
+        self.store_rays(rays, square_hits, wall_hits, hit_mask)
+        return rays, square_hits, wall_hits, hit_mask
+
+    @property
+    def rays_cast(self):
+        return self.convergence.count
+
+    def store_rays(self, rays, square_hits, wall_hits, hit_mask, width=None):
+        """
+        Merge a batch of cast results, e.g. from a ParallelRaySampler, into the stored history.
+
+        :param width: length of the y-interval the batch was sampled from,
+            defaulting to the sampler's last interval
+        """
+        self.rays.extend(rays)
+        width = self.sampler.width if width is None else width
+        self.convergence.update(hit_mask, wall_hits[:, 0] - square_hits[:, 0], width)
+
+        hits = np.stack((square_hits[hit_mask], wall_hits[hit_mask]), axis=1)
+        triangles = np.empty((0, 3, 2))
+        if len(hits):
+            # Each new first intersection forms a triangle with the one before it
+            if len(self.hits):
+                chain = np.concatenate((self.hits[-1:], hits))
+            else:
+                chain = hits
+            triangles = np.stack((
+                chain[:-1, 0],  # Previous first intersection
+                chain[1:, 0],  # Current first intersection
+                chain[:-1, 1],  # Previous second intersection
+            ), axis=1)
+            self.triangles.extend(triangles)
+            self.hits.extend(hits)
+            self.mesh.insert(hits)
+
+        if self.recorder is not None:
+            self.record(rays, square_hits, wall_hits, hit_mask, width, triangles)
+
+    def record(self, rays, square_hits, wall_hits, hit_mask, width, triangles):
+        """Append one stored batch, with the intersection pairs and triangles it produced, to the recorder."""
+        self.recorder.record(
+            rays=rays,
+            square_hits=square_hits,
+            wall_hits=wall_hits,
+            hit=hit_mask,
+            width=width,
+            intersections=np.stack((square_hits[hit_mask], wall_hits[hit_mask]), axis=1),
+            triangles=triangles,
+        )
+
+    def replay_step(self, step):
+        """Store one batch recorded by ``record``, as read from a FrameArchive."""
+        self.store_rays(step["rays"], step["square_hits"], step["wall_hits"], step["hit"], float(step["width"]))
+
+    def sample_until(self, target_error, batch=4096, max_rays=10 ** 7):
+        """
+        Keep casting batches until the relative standard error of the area estimate reaches ``target_error``.
+
+        Rays are cast even in analytic mode, where add_rays casts none.
+
+        :return: True if the target was reached within ``max_rays`` rays
+        """
+        while self.rays_cast < max_rays:
+            self.store_rays(*self.cast_rays(min(batch, max_rays - self.rays_cast)))
+            if self.convergence.count > 1 and self.convergence.relative_area_error <= target_error:
+                return True
+        return False
+
+    def analytic_shadow(self):
+        """Return the exact shadow as a triangle strip from the lit silhouette to the backboard."""
+        return shadow_strip(self.square.lit_silhouette(), WALL_X)
+
+    def shadow_error(self):
+        """
+        Compare the Monte Carlo shadow estimate with the analytic one.
+
+        :return: dict with the exact and estimated shadow height and area,
+            their relative errors, the estimated relative standard error of
+            the area, the fraction of the exact y-extent covered
+            by stored hits, the largest distance of a stored hit from the
+            exact silhouette, and the StripMesh pair count and area error
+        """
+        silhouette = self.square.lit_silhouette()
+        exact_height = silhouette[-1, 1] - silhouette[0, 1]
+        exact_area = shadow_area(silhouette, WALL_X)
+
+        height = self.convergence.height
+        area = self.convergence.area
+
+        hits = self.hits.view()[:, 0]
+        if len(hits):
+            coverage = (hits[:, 1].max() - hits[:, 1].min()) / exact_height
+            deviation = np.abs(hits[:, 0] - np.interp(hits[:, 1], silhouette[:, 1], silhouette[:, 0])).max()
+        else:
+            coverage = 0.0
+            deviation = 0.0
+
+        return {
+            "rays": self.rays_cast,
+            "exact_height": exact_height,
+            "height": height,
+            "height_error": abs(height - exact_height) / exact_height,
+            "exact_area": exact_area,
+            "area": area,
+            "area_error": abs(area - exact_area) / exact_area,
+            "area_stderr": self.convergence.relative_area_error,
+            "coverage": coverage,
+            "silhouette_deviation": deviation,
+            "mesh_pairs": len(self.mesh),
+            "mesh_area_error": abs(self.mesh.area() - exact_area) / exact_area,
+        }
+
+    def format_shadow_error(self):
+        """Return shadow_error() as a one-line report."""
+        error = self.shadow_error()
+        return (
+            f"rays={error['rays']} "
+            f"height={error['height']:.3f}/{error['exact_height']:.3f} ({error['height_error']:.2%}) "
+            f"area={error['area']:.3f}/{error['exact_area']:.3f} ({error['area_error']:.2%}, "
+            f"stderr {error['area_stderr']:.2%}) "
+            f"coverage={error['coverage']:.2%} deviation={error['silhouette_deviation']:.2e} "
+            f"mesh={error['mesh_pairs']} pairs ({error['mesh_area_error']:.2%})"
+        )
+
+    def draw_analytic_shadow(self):
+        """Draw the exact shadow strip with the current color."""
+        gl.glBegin(gl.GL_TRIANGLE_STRIP)
+        for x, y in self.analytic_shadow():
+            gl.glVertex2f(x, y)
+        gl.glEnd()
 
     def draw_rays(self):
         """Draw the rays while keeping the incoming rays parallel."""
-    
+        if self.retained:
+            self.ray_buffer.sync(self.rays)
+            self.ray_buffer.draw(gl.GL_LINES, (0, 0.2, 0))
+            self.hit_buffer.sync(self.hits)
+            self.hit_buffer.draw(gl.GL_LINES, (1, 0, 1))
+            gl.glPointSize(5)
+            self.hit_buffer.draw(gl.GL_POINTS, (1, 0, 0))
+            return
+
         # Green: Parallel rays going all the way across
-        glColor3f(0, 0.2, 0)  # Green for incoming rays
-        glBegin(GL_LINES)
+        gl.glColor3f(0, 0.2, 0)  # Green for incoming rays
+        gl.glBegin(gl.GL_LINES)
         for ray in self.rays:
-            glVertex2f(ray.coords[0][0], ray.coords[0][1])  # Start far left
-            glVertex2f(ray.coords[1][0], ray.coords[1][1])  # End far right
-        glEnd()
+            gl.glVertex2f(ray[0][0], ray[0][1])  # Start far left
+            gl.glVertex2f(ray[1][0], ray[1][1])  # End far right
+        gl.glEnd()
 
         # Purple: The segment from square intersection to backboard
-        glColor3f(1, 0, 1)  # Purple for rays from square to the backboard
-        glBegin(GL_LINES)
-        for i in range(len(self.second_intersections)):
-            glVertex2f(self.first_intersections[i][0], self.first_intersections[i][1])
-            glVertex2f(self.second_intersections[i][0], self.second_intersections[i][1])
-        glEnd()
+        gl.glColor3f(1, 0, 1)  # Purple for rays from square to the backboard
+        gl.glBegin(gl.GL_LINES)
+        for first, second in self.hits:
+            gl.glVertex2f(first[0], first[1])
+            gl.glVertex2f(second[0], second[1])
+        gl.glEnd()
 
         # Red: Intersection points (square + backboard)
-        glColor3f(1, 0, 0)  
-        glPointSize(5)
-        glBegin(GL_POINTS)
-        for x, y in self.first_intersections + self.second_intersections:
-            glVertex2f(x, y)
-        glEnd()
+        gl.glColor3f(1, 0, 0)  
+        gl.glPointSize(5)
+        gl.glBegin(gl.GL_POINTS)
+        for x, y in self.hits.view().reshape(-1, 2):
+            gl.glVertex2f(x, y)
+        gl.glEnd()
 
 
     def draw_triangles(self):
         """Draws shaded triangles to fully fill the background behind the square."""
-        glColor3f(0.5, 0.5, 0.5)  # Gray shade for infill
-        glBegin(GL_TRIANGLES)
-
-        for i in range(len(self.first_intersections) - 1):
+        gl.glColor3f(0.5, 0.5, 0.5)  # Gray shade for infill
+        if self.analytic:
+            self.draw_analytic_shadow()
+            return
+        if self.sorted_strips:
+            self.draw_mesh()
+            return
+        if self.retained:
+            self.strip_buffer.sync(self.hits)
+            self.strip_buffer.draw(gl.GL_TRIANGLES)
+            return
+
+        gl.glBegin(gl.GL_TRIANGLES)
+
+        hits = self.hits.view()
+        for i in range(len(hits) - 1):
             # Points from two consecutive rays
-            p1, p2 = self.first_intersections[i], self.first_intersections[i + 1]
-            b1, b2 = self.second_intersections[i], self.second_intersections[i + 1]
+            (p1, b1), (p2, b2) = hits[i], hits[i + 1]
 
             # Triangle 1: (p1, p2, b1)
-            glVertex2f(p1[0], p1[1])
-            glVertex2f(p2[0], p2[1])
-            glVertex2f(b1[0], b1[1])
+            gl.glVertex2f(p1[0], p1[1])
+            gl.glVertex2f(p2[0], p2[1])
+            gl.glVertex2f(b1[0], b1[1])
 
             # Triangle 2: (b1, p2, b2)
-            glVertex2f(b1[0], b1[1])
-            glVertex2f(p2[0], p2[1])
-            glVertex2f(b2[0], b2[1])
-
-        glEnd()
-
+            gl.glVertex2f(b1[0], b1[1])
+            gl.glVertex2f(p2[0], p2[1])
+            gl.glVertex2f(b2[0], b2[1])
+
+        gl.glEnd()
+
+    def draw_mesh(self):
+        """Draw the height-sorted StripMesh as one triangle strip with the current color."""
+        if len(self.mesh) < 2:
+            return
+        if self.retained:
+            # The strip only changes when hits arrive, so most frames just draw it again
+            if self.mesh_uploaded != self.mesh.version:
+                # Pairs before the first insert or delete since the last upload are already on the GPU
+                first, strip = self.mesh.changes()
+                self.mesh_stream.patch(strip, first)
+                self.mesh_uploaded = self.mesh.version
+            self.mesh_stream.draw_uploaded(2 * len(self.mesh), gl.GL_TRIANGLE_STRIP)
+            return
+        gl.glBegin(gl.GL_TRIANGLE_STRIP)
+        for x, y in self.mesh.strip():
+            gl.glVertex2f(x, y)
+        gl.glEnd()
+
+    def delete_buffers(self):
+        """Release the GPU copies of the history."""
+        for buffer in (self.ray_buffer, self.hit_buffer, self.strip_buffer, self.mesh_stream):
+            buffer.delete()
+        self.mesh_uploaded = None
+
+
+def strip_triangles(hits, previous=None):
+    """
+    Return the two triangles joining every intersection pair to the one before it.
+
+    :param hits: (n, 2, 2) (square, backboard) intersection pairs
+    :param previous: pair before ``hits[0]``, or None to leave the first
+        pair's triangles degenerate
+    :return: (n * 6, 2) vertices, triangles (p1, p2, b1) and (b1, p2, b2)
+    """
+    hits = np.asarray(hits)
+    before = np.concatenate((hits[:1] if previous is None else np.asarray(previous)[None], hits[:-1]))
+    p1, b1 = before[:, 0], before[:, 1]
+    p2, b2 = hits[:, 0], hits[:, 1]
+    return np.stack((p1, p2, b1, b1, p2, b2), axis=1).reshape(-1, 2)
+
+
+# Shared with the other tracer, bound to this program's MonteCarloRayTracer
+replay = partial(tracing.replay, MonteCarloRayTracer)
+run_headless = partial(tracing.run_headless, MonteCarloRayTracer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo strip-shadow tracer for a square.")
+    parser.add_argument("--headless", action="store_true", help="cast rays without a window and report steps/s")
+    parser.add_argument("--steps", type=int, default=1000, help="ray batches to cast in headless mode")
+    parser.add_argument("--rays", type=int, default=1, help="rays per batch in headless mode")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for headless runs")
+    parser.add_argument("--workers", type=int, default=None, help="processes to spread headless ray casting over")
+    parser.add_argument("--strategy", choices=RaySampler.STRATEGIES, default="uniform", help="ray origin sampling")
+    parser.add_argument("--importance", action="store_true", help="only sample the square's projected y-extent")
+    parser.add_argument("--target-error", type=float, default=None,
+                        help="headless: sample until the relative area standard error drops below this")
+    parser.add_argument("--record", default=None, help="record every ray batch to this archive directory")
+    parser.add_argument("--replay", default=None, help="replay batches from this archive instead of casting rays")
+    parser.add_argument("--frames", default="0:", help="START:STOP range of recorded batches to replay")
+    parser.add_argument("--analytic", action="store_true", help="draw the exact shadow instead of sampling")
+    parser.add_argument("--validate", action="store_true", help="periodically report Monte Carlo error")
+    parser.add_argument("--immediate", action="store_true",
+                        help="resubmit the whole history every frame instead of keeping it on the GPU (toggle with V)")
+    parser.add_argument("--arrival-order", action="store_true",
+                        help="join hits in arrival order instead of drawing the height-sorted mesh (toggle with S)")
+    parser.add_argument("--no-merge", action="store_true", help="keep collinear pairs in the height-sorted mesh")
+    args = parser.parse_args(argv)
+    frames = tuple(int(bound) if bound else None for bound in args.frames.split(":"))
+
+    if args.headless and args.replay is not None:
+        print(replay(args.replay, *frames).format_shadow_error())
+    elif args.headless and args.target_error is not None:
+        ray_tracer = MonteCarloRayTracer(
+            Square(side_length=6, center=(0, 0), rotation=30),
+            sampler=RaySampler(args.strategy, args.importance, seed=args.seed),
+        )
+        converged = ray_tracer.sample_until(args.target_error)
+        print(("converged: " if converged else "not converged: ") + ray_tracer.format_shadow_error())
+    elif args.headless:
+        results = run_headless(args.steps, args.rays, args.seed, args.workers, args.strategy, args.importance,
+                               args.record)
+        print(f"{args.steps} steps in {results['elapsed']:.3f}s ({results['steps_per_second']:.1f} steps/s)")
+    else:
+        myApp = App(analytic=args.analytic, validate=args.validate, record=args.record, replay=args.replay,
+                    frames=frames, retained=not args.immediate, sorted_strips=not args.arrival_order,
+                    merge=not args.no_merge)
+        myApp.mainLoop()
+        myApp.quit()
 
 
 if __name__ == "__main__":
-    myApp = App()
-    myApp.mainLoop()
-    myApp.quit()
+    main()
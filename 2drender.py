@@ -1,25 +1,43 @@
+import argparse
+from functools import partial
+
 import numpy as np
-import pygame as pg
-from OpenGL.GL import *
-from shapely.geometry import LineString, Point
+
+import tracing
+from geometry import intersect_rays_segments, shadow_area, shadow_strip
+from history import RingBuffer
+from lazy import LazyModule
+from recording import FrameArchive, FrameRecorder
+from sampling import ConvergenceStats, RaySampler
+from tracing import RIGHT_WALL, WALL_X, Square, recording_metadata
+
+# Window and GL are only imported once something draws, so headless runs start without them
+pg = LazyModule("pygame")
+gl = LazyModule("OpenGL.GL")
 
 
 class App:
-    def __init__(self):
+    def __init__(self, analytic=False, validate=False, record=None, replay=None, frames=(0, None)):
         pg.init()
         pg.display.set_mode((500, 500), pg.OPENGL | pg.DOUBLEBUF)
         self.clock = pg.time.Clock()
 
-        glClearColor(0, 0, 0, 1)
-        glOrtho(-10, 10, -10, 10, -1, 1)  # Orthographic projection
+        gl.glClearColor(0, 0, 0, 1)
+        gl.glOrtho(-10, 10, -10, 10, -1, 1)  # Orthographic projection
 
         self.square = Square(side_length=6, center=(0, 0), rotation=30)
-        self.ray_tracer = MonteCarloRayTracer(self.square)
+        self.replay = None  # Recorded steps fed back in place of new rays
+        if replay is not None:
+            archive = FrameArchive(replay)
+            self.square = Square(**archive.metadata["square"])
+            self.replay = archive.frame_range(*frames)
+        self.ray_tracer = MonteCarloRayTracer(self.square, analytic=analytic)
+        if record is not None:
+            self.ray_tracer.recorder = FrameRecorder(record, metadata=recording_metadata(self.square))
+        self.validate = validate  # Periodically report Monte Carlo error against the exact shadow
 
         self.frame_counter = 0  # To slow down ray spawning
 
-        self.mainLoop()
-
     def mainLoop(self):
         running = True
         while running:
@@ -27,177 +45,326 @@ class App:
                 if event.type == pg.QUIT:
                     running = False
 
-            glClear(GL_COLOR_BUFFER_BIT)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
             # Draw square
             self.square.draw()
 
             # Add a new ray every few frames
             if self.frame_counter % 10 == 0:  # Slow down ray spawning
-                self.ray_tracer.add_ray()
+                if self.replay is not None:
+                    step = next(self.replay, None)
+                    if step is not None:
+                        self.ray_tracer.replay_step(step)
+                else:
+                    self.ray_tracer.add_ray()
 
             # Draw rays and triangles
             self.ray_tracer.draw_rays()
             self.ray_tracer.draw_triangles()
 
+            if self.validate and self.frame_counter % 60 == 0:
+                print(self.ray_tracer.format_shadow_error())
+
             pg.display.flip()
             self.clock.tick(60)  # 60 FPS
             self.frame_counter += 1
 
+        if self.ray_tracer.recorder is not None:
+            self.ray_tracer.recorder.close()
         self.quit()
 
     def quit(self):
         pg.quit()
 
 
-class Square:
-    def __init__(self, side_length=6, center=(0, 0), rotation=30):
-        self.side_length = side_length
-        self.center = np.array(center)
-        self.rotation = np.radians(rotation)
-        self.vertices = self.generate_vertices()
-        self.edges = self.get_edges()
-
-    def generate_vertices(self):
-        """Generate square vertices given side length, center, and rotation."""
-        half_side = self.side_length / 2
-        square = np.array([
-            [-half_side, -half_side],
-            [ half_side, -half_side],
-            [ half_side,  half_side],
-            [-half_side,  half_side]
-        ])
-
-        # Rotation matrix
-        rotation_matrix = np.array([
-            [np.cos(self.rotation), -np.sin(self.rotation)],
-            [np.sin(self.rotation), np.cos(self.rotation)]
-        ])
-
-        # Apply rotation and translation
-        rotated_square = (square @ rotation_matrix.T) + self.center
-
-        return rotated_square
-
-    def get_edges(self):
-        """Return Shapely LineStrings for square edges."""
-        return [
-            LineString([self.vertices[i], self.vertices[(i + 1) % 4]])
-            for i in range(4)
-        ]
-
-    def draw(self):
-        """Draw the square using OpenGL."""
-        glColor3f(1, 1, 1)  # White color
-        glBegin(GL_LINE_LOOP)
-        for vertex in self.vertices:
-            glVertex2f(vertex[0], vertex[1])
-        glEnd()
-
-
 class MonteCarloRayTracer:
-    def __init__(self, square):
+    def __init__(self, square, capacity=4096, policy="oldest", analytic=False, sampler=None, seed=None):
+        """
+        :param square: occluder the rays are cast against
+        :param capacity: maximum number of rays, hits and triangles kept
+        :param policy: "oldest" drops the oldest entries once full,
+            "decimate" thins the whole history instead
+        :param analytic: skip sampling and draw the exact shadow instead
+        :param sampler: RaySampler choosing ray origins, uniform by default
+        :param seed: seed for the default sampler
+        """
         self.square = square
-        self.rays = []  # Store all previous rays
-        self.intersections = []  # Store intersection points
-        self.triangles = []  # Store generated triangles
-
-    def generate_parallel_ray(self):
-        """Generate a parallel ray that moves exactly rightward."""
-        origin_x = -10  # Start from the far left
-        origin_y = np.random.uniform(-10, 10)  # Random y-position
-        end_x = 10  # Extend far right
-        end_y = origin_y  # Same y-value for perfect parallelism
-
-        return LineString([(origin_x, origin_y), (end_x, end_y)])
+        self.analytic = analytic
+        self.sampler = sampler if sampler is not None else RaySampler(seed=seed)
+        self.convergence = ConvergenceStats()  # Running Monte Carlo estimates
+        self.recorder = None  # FrameRecorder every stored batch is appended to
+        self.rays = RingBuffer(capacity, (2, 2), policy=policy)  # Store previous rays
+        self.intersections = RingBuffer(capacity, (2, 2), policy=policy)  # Store (square, wall) intersection pairs
+        self.triangles = RingBuffer(capacity, (3, 2), policy=policy)  # Store generated triangles
+
+    def generate_parallel_rays(self, count):
+        """Generate (count, 2, 2) ray segments that move exactly rightward."""
+        _, ymin, _, ymax = self.square.bbox
+        origin_y = self.sampler.sample(count, (ymin, ymax))  # Sampled y-positions
+        rays = np.empty((count, 2, 2))
+        rays[:, 0, 0] = -10  # Start from the far left
+        rays[:, 1, 0] = 10  # Extend far right
+        rays[:, :, 1] = origin_y[:, None]  # Same y-value for perfect parallelism
+        return rays
+
+    def cast_rays(self, count):
+        """
+        Cast a batch of parallel rays and intersect them all at once.
+
+        :return: (rays, square_hits, wall_hits, hit_mask) where rays is
+            (count, 2, 2), the hit arrays are (count, 2) and hit_mask marks
+            rays that hit both the square and the right-side wall
+        """
+        rays = self.generate_parallel_rays(count)
+        origins = rays[:, 0]
+        directions = rays[:, 1] - rays[:, 0]
+
+        # Closest square intersection and the right-side screen boundary (x = 10)
+        _, square_hits, square_mask, _ = intersect_rays_segments(origins, directions, self.square.segments)
+        _, wall_hits, wall_mask, _ = intersect_rays_segments(origins, directions, RIGHT_WALL)
+
+        return rays, square_hits, wall_hits, square_mask & wall_mask
 
     def add_ray(self):
         """Generate a new ray, find intersections, and store results."""
-        ray = self.generate_parallel_ray()
-        self.rays.append(ray)
-
-        # Find the closest square intersection
-        closest_intersection = None
-        min_distance = float("inf")
-
-        for edge in self.square.get_edges():
-            intersection = ray.intersection(edge)
-            if intersection and not intersection.is_empty:
-                if isinstance(intersection, Point):
-                    dist = abs(ray.coords[0][0] - intersection.x)
-                    if dist < min_distance:
-                        closest_intersection = intersection
-                        min_distance = dist
-
-        # Find intersection with the right-side screen boundary (x = 10)
-        right_wall = LineString([(10, -10), (10, 10)])
-        right_intersection = ray.intersection(right_wall)
-
-        if closest_intersection and isinstance(right_intersection, Point):
-            # Store intersection points
-            self.intersections.append((closest_intersection.x, closest_intersection.y))
-            self.intersections.append((right_intersection.x, right_intersection.y))
-
-            # Create triangle from:
-            # 1. Intersection with square
-            # 2. Intersection with right screen
-            # 3. The ray's original left-side position
-            self.triangles.append([
-                (closest_intersection.x, closest_intersection.y),
-                (right_intersection.x, right_intersection.y),
-                (ray.coords[0][0], ray.coords[0][1])
-            ])
+        self.add_rays(1)
+
+    def add_rays(self, count):
+        """
+        Cast a batch of rays and store the rays, intersections and triangles.
+
+        :return: the cast_rays() arrays for this batch, or None in analytic mode
+        """
+        if self.analytic:
+            return None  # The exact shadow needs no samples
+
+        rays, square_hits, wall_hits, hit_mask = self.cast_rays(count)
+        self.store_rays(rays, square_hits, wall_hits, hit_mask)
+        return rays, square_hits, wall_hits, hit_mask
+
+    @property
+    def rays_cast(self):
+        return self.convergence.count
+
+    def store_rays(self, rays, square_hits, wall_hits, hit_mask, width=None):
+        """
+        Merge a batch of cast results, e.g. from a ParallelRaySampler, into the stored history.
+
+        :param width: length of the y-interval the batch was sampled from,
+            defaulting to the sampler's last interval
+        """
+        self.rays.extend(rays)
+        width = self.sampler.width if width is None else width
+        self.convergence.update(hit_mask, wall_hits[:, 0] - square_hits[:, 0], width)
+
+        square_points = square_hits[hit_mask]
+        wall_points = wall_hits[hit_mask]
+
+        # Store intersection points, square hit paired with wall hit
+        self.intersections.extend(np.stack((square_points, wall_points), axis=1))
+
+        # Create triangles from:
+        # 1. Intersection with square
+        # 2. Intersection with right screen
+        # 3. The ray's original left-side position
+        triangles = np.stack((square_points, wall_points, rays[hit_mask, 0]), axis=1)
+        self.triangles.extend(triangles)
+
+        if self.recorder is not None:
+            self.record(rays, square_hits, wall_hits, hit_mask, width, triangles)
+
+    def record(self, rays, square_hits, wall_hits, hit_mask, width, triangles):
+        """Append one stored batch, with the intersection pairs and triangles it produced, to the recorder."""
+        self.recorder.record(
+            rays=rays,
+            square_hits=square_hits,
+            wall_hits=wall_hits,
+            hit=hit_mask,
+            width=width,
+            intersections=np.stack((square_hits[hit_mask], wall_hits[hit_mask]), axis=1),
+            triangles=triangles,
+        )
+
+    def replay_step(self, step):
+        """Store one batch recorded by ``record``, as read from a FrameArchive."""
+        self.store_rays(step["rays"], step["square_hits"], step["wall_hits"], step["hit"], float(step["width"]))
+
+    def sample_until(self, target_error, batch=4096, max_rays=10 ** 7):
+        """
+        Keep casting batches until the relative standard error of the area estimate reaches ``target_error``.
+
+        Rays are cast even in analytic mode, where add_rays casts none.
+
+        :return: True if the target was reached within ``max_rays`` rays
+        """
+        while self.rays_cast < max_rays:
+            self.store_rays(*self.cast_rays(min(batch, max_rays - self.rays_cast)))
+            if self.convergence.count > 1 and self.convergence.relative_area_error <= target_error:
+                return True
+        return False
+
+    def analytic_shadow(self):
+        """Return the exact shadow as a triangle strip from the lit silhouette to the backboard."""
+        return shadow_strip(self.square.lit_silhouette(), WALL_X)
+
+    def shadow_error(self):
+        """
+        Compare the Monte Carlo shadow estimate with the analytic one.
+
+        :return: dict with the exact and estimated shadow height and area,
+            their relative errors, the estimated relative standard error of
+            the area, the fraction of the exact y-extent covered
+            by stored hits and the largest distance of a stored hit from the
+            exact silhouette
+        """
+        silhouette = self.square.lit_silhouette()
+        exact_height = silhouette[-1, 1] - silhouette[0, 1]
+        exact_area = shadow_area(silhouette, WALL_X)
+
+        height = self.convergence.height
+        area = self.convergence.area
+
+        hits = self.intersections.view()[:, 0]
+        if len(hits):
+            coverage = (hits[:, 1].max() - hits[:, 1].min()) / exact_height
+            deviation = np.abs(hits[:, 0] - np.interp(hits[:, 1], silhouette[:, 1], silhouette[:, 0])).max()
+        else:
+            coverage = 0.0
+            deviation = 0.0
+
+        return {
+            "rays": self.rays_cast,
+            "exact_height": exact_height,
+            "height": height,
+            "height_error": abs(height - exact_height) / exact_height,
+            "exact_area": exact_area,
+            "area": area,
+            "area_error": abs(area - exact_area) / exact_area,
+            "area_stderr": self.convergence.relative_area_error,
+            "coverage": coverage,
+            "silhouette_deviation": deviation,
+        }
+
+    def format_shadow_error(self):
+        """Return shadow_error() as a one-line report."""
+        error = self.shadow_error()
+        return (
+            f"rays={error['rays']} "
+            f"height={error['height']:.3f}/{error['exact_height']:.3f} ({error['height_error']:.2%}) "
+            f"area={error['area']:.3f}/{error['exact_area']:.3f} ({error['area_error']:.2%}, "
+            f"stderr {error['area_stderr']:.2%}) "
+            f"coverage={error['coverage']:.2%} deviation={error['silhouette_deviation']:.2e}"
+        )
+
+    def draw_analytic_shadow(self):
+        """Draw the exact shadow strip with the current color."""
+        gl.glBegin(gl.GL_TRIANGLE_STRIP)
+        for x, y in self.analytic_shadow():
+            gl.glVertex2f(x, y)
+        gl.glEnd()
 
     def draw_rays(self):
         """Draw only the latest ray and render gray continuation past the square."""
-        if not self.rays:
+        if not len(self.rays):
             return
 
         latest_ray = self.rays[-1]  # Get the most recent ray
 
         # Draw the latest ray in green
-        glColor3f(0, 1, 0)  # Green for main ray
-        glBegin(GL_LINES)
-        glVertex2f(latest_ray.coords[0][0], latest_ray.coords[0][1])
-        glVertex2f(latest_ray.coords[1][0], latest_ray.coords[1][1])
-        glEnd()
+        gl.glColor3f(0, 1, 0)  # Green for main ray
+        gl.glBegin(gl.GL_LINES)
+        gl.glVertex2f(latest_ray[0][0], latest_ray[0][1])
+        gl.glVertex2f(latest_ray[1][0], latest_ray[1][1])
+        gl.glEnd()
 
-        # Draw the gray "continued" ray from the intersection to the right edge
-        if len(self.intersections) >= 2:
-            glColor3f(0.5, 0.5, 0.5)  # Gray for post-intersection rays
-            glBegin(GL_LINES)
-            for i in range(0, len(self.intersections), 2):
-                start = self.intersections[i]    # Intersection with square
-                end = self.intersections[i + 1]  # Intersection with right screen edge
-                glVertex2f(start[0], start[1])
-                glVertex2f(end[0], end[1])
-            glEnd()
+        if not len(self.intersections):
+            return
 
-        # Draw "shadow" effect by making lines more opaque behind the square
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glBegin(GL_LINES)
-        for i, (start, end) in enumerate(zip(self.intersections[::2], self.intersections[1::2])):
-            opacity = min(1.0, (i + 1) / len(self.intersections))  # Increase opacity over time
-            glColor4f(0.2, 0.2, 0.2, opacity)  # Dark gray with increasing opacity
-            glVertex2f(start[0], start[1])
-            glVertex2f(end[0], end[1])
-        glEnd()
-        glDisable(GL_BLEND)
+        # Square hit followed by right screen edge hit for every stored ray
+        points = self.intersections.view().reshape(-1, 2)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_DOUBLE, 0, points)
 
+        # Draw the gray "continued" ray from the intersection to the right edge
+        gl.glColor3f(0.5, 0.5, 0.5)  # Gray for post-intersection rays
+        gl.glDrawArrays(gl.GL_LINES, 0, len(points))
 
+        # Draw "shadow" effect by making lines more opaque behind the square
+        opacity = np.minimum(1.0, np.arange(1, len(self.intersections) + 1) / len(points))  # Increase opacity over time
+        colors = np.empty((len(points), 4))
+        colors[:, :3] = 0.2  # Dark gray with increasing opacity
+        colors[:, 3] = np.repeat(opacity, 2)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+        gl.glEnableClientState(gl.GL_COLOR_ARRAY)
+        gl.glColorPointer(4, gl.GL_DOUBLE, 0, colors)
+        gl.glDrawArrays(gl.GL_LINES, 0, len(points))
+        gl.glDisableClientState(gl.GL_COLOR_ARRAY)
+        gl.glDisable(gl.GL_BLEND)
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
 
     def draw_triangles(self):
         """Draw the generated triangles."""
-        glColor3f(0, 0, 1)  # Blue triangles
-        glBegin(GL_TRIANGLES)
-        for tri in self.triangles:
-            for x, y in tri:
-                glVertex2f(x, y)
-        glEnd()
+        if self.analytic:
+            gl.glColor3f(0, 0, 1)  # Blue exact shadow
+            self.draw_analytic_shadow()
+            return
+
+        if not len(self.triangles):
+            return
+
+        gl.glColor3f(0, 0, 1)  # Blue triangles
+        vertices = self.triangles.view().reshape(-1, 2)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_DOUBLE, 0, vertices)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(vertices))
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+
+
+# Shared with the other tracer, bound to this program's MonteCarloRayTracer
+replay = partial(tracing.replay, MonteCarloRayTracer)
+run_headless = partial(tracing.run_headless, MonteCarloRayTracer)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo ray tracer for a square's shadow.")
+    parser.add_argument("--headless", action="store_true", help="cast rays without a window and report steps/s")
+    parser.add_argument("--steps", type=int, default=1000, help="ray batches to cast in headless mode")
+    parser.add_argument("--rays", type=int, default=1, help="rays per batch in headless mode")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for headless runs")
+    parser.add_argument("--workers", type=int, default=None, help="processes to spread headless ray casting over")
+    parser.add_argument("--strategy", choices=RaySampler.STRATEGIES, default="uniform", help="ray origin sampling")
+    parser.add_argument("--importance", action="store_true", help="only sample the square's projected y-extent")
+    parser.add_argument("--target-error", type=float, default=None,
+                        help="headless: sample until the relative area standard error drops below this")
+    parser.add_argument("--record", default=None, help="record every ray batch to this archive directory")
+    parser.add_argument("--replay", default=None, help="replay batches from this archive instead of casting rays")
+    parser.add_argument("--frames", default="0:", help="START:STOP range of recorded batches to replay")
+    parser.add_argument("--analytic", action="store_true", help="draw the exact shadow instead of sampling")
+    parser.add_argument("--validate", action="store_true", help="periodically report Monte Carlo error")
+    args = parser.parse_args(argv)
+    frames = tuple(int(bound) if bound else None for bound in args.frames.split(":"))
+
+    if args.headless and args.replay is not None:
+        print(replay(args.replay, *frames).format_shadow_error())
+    elif args.headless and args.target_error is not None:
+        ray_tracer = MonteCarloRayTracer(
+            Square(side_length=6, center=(0, 0), rotation=30),
+            sampler=RaySampler(args.strategy, args.importance, seed=args.seed),
+        )
+        converged = ray_tracer.sample_until(args.target_error)
+        print(("converged: " if converged else "not converged: ") + ray_tracer.format_shadow_error())
+    elif args.headless:
+        results = run_headless(args.steps, args.rays, args.seed, args.workers, args.strategy, args.importance,
+                               args.record)
+        print(f"{args.steps} steps in {results['elapsed']:.3f}s ({results['steps_per_second']:.1f} steps/s)")
+    else:
+        myApp = App(analytic=args.analytic, validate=args.validate, record=args.record, replay=args.replay,
+                    frames=frames)
+        myApp.mainLoop()
+        myApp.quit()
 
 
 if __name__ == "__main__":
-    myApp = App()
-    myApp.mainLoop()
-    myApp.quit()
+    main()
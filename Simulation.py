@@ -1,43 +1,144 @@
+import argparse
+import time
+
 import numpy as np
-import pygame as pg
-from OpenGL.GL import *
-from shapely.geometry import Point, Polygon
+
+from geometry import (
+    half_planes, is_convex, points_in_convex_polygon, polygon_coverage, polygon_segments, rotation_matrix, signed_area,
+)
+from glbuffers import MaskTexture, VertexStream
+from lazy import LazyModule
+from pipeline import FramePipeline
+from profiler import FrameProfiler
+from recording import FrameArchive, FrameRecorder
+from spatial import UniformGrid
+
+# Window, GL and shapely are only imported once something uses them, so
+# headless runs and batch jobs start without them
+pg = LazyModule("pygame")
+gl = LazyModule("OpenGL.GL")
 
 class App:
-    def __init__(self):
+    def __init__(self, use_vbo=True, profile=False, trace_path=None, pipelined=False, occluders=None, moving=1.0,
+                 raster=False, resolution=512, record=None, replay=None, frames=(0, None), num_points=1000,
+                 refresh=None):
         pg.init()
         pg.display.set_mode((500, 500), pg.OPENGL | pg.DOUBLEBUF)
         self.clock = pg.time.Clock()
         
-        glClearColor(0, 0, 0, 1)
-        glOrtho(-10, 10, -10, 10, -1, 1)  # Orthographic projection
+        gl.glClearColor(0, 0, 0, 1)
+        gl.glOrtho(-10, 10, -10, 10, -1, 1)  # Orthographic projection
         
         self.square = Square(side_length=6, center=(0, 0), rotation=30, rotation_speed=0.5)  # Added rotation_speed
-        self.shadow_renderer = ShadowRenderer(self.square)
-        
-        self.mainLoop()
+        if occluders:
+            self.square = Scene.random(occluders, moving=moving)
+        self.shadow_renderer = ShadowRenderer(self.square, num_points=num_points, use_vbo=use_vbo, raster=raster,
+                                              resolution=resolution, refresh=refresh)
+
+        # Per-phase frame timing; P toggles the on-screen overlay
+        self.profiler = FrameProfiler(enabled=profile or trace_path is not None)
+        self.show_overlay = profile
+        self.trace_path = trace_path
+
+        # Frames can be recorded to an archive, or read back from one instead of simulated
+        self.recorder = FrameRecorder(record, metadata={"kind": "shadow"}) if record is not None else None
+        self.replay = FrameArchive(replay).frame_range(*frames) if replay is not None else None
+
+        # Frames are prepared serially into one buffer, or on a worker
+        # thread into two while the previous one is drawn; T toggles
+        self.frame = ShadowFrame()
+        self.pipeline = None
+        if pipelined:
+            self.start_pipeline()
+
+    def start_pipeline(self):
+        if self.replay is not None:
+            return  # Replayed frames are read, not prepared
+        self.pipeline = FramePipeline(
+            self.shadow_renderer.prepare, (ShadowFrame(), ShadowFrame()), self.profiler
+        )
+
+    def stop_pipeline(self):
+        """Stop the worker; the serial loop continues from wherever it got to."""
+        self.pipeline.close()
+        self.pipeline = None
+
+    def next_frame(self):
+        """Return a prepared frame, from the pipeline if it is running."""
+        if self.replay is not None:
+            with self.profiler.phase("replay"):
+                step = next(self.replay, None)
+                if step is not None:
+                    self.frame = ShadowFrame.from_record(step, self.shadow_renderer.rng)
+            return self.frame  # Hold the last frame once the range is done
+        if self.pipeline is not None:
+            with self.profiler.phase("wait_frame"):
+                frame = self.pipeline.acquire()
+            if frame is not None:
+                return frame
+            print(f"frame pipeline failed ({self.pipeline.error!r}), falling back to the serial loop")
+            self.stop_pipeline()
+        with self.profiler.phase("prepare"):
+            return self.shadow_renderer.prepare(self.frame)
     
     def mainLoop(self):
+        profiler = self.profiler
         running = True
         while running:
-            for event in pg.event.get():
-                if event.type == pg.QUIT:
-                    running = False
+            with profiler.phase("events"):
+                for event in pg.event.get():
+                    if event.type == pg.QUIT:
+                        running = False
+                    elif event.type == pg.KEYDOWN and event.key == pg.K_v:
+                        # Toggle between buffer-object and immediate mode to compare frame times
+                        self.shadow_renderer.use_vbo = not self.shadow_renderer.use_vbo
+                    elif event.type == pg.KEYDOWN and event.key == pg.K_p:
+                        profiler.enabled = True
+                        self.show_overlay = not self.show_overlay
+                    elif event.type == pg.KEYDOWN and event.key == pg.K_r:
+                        # Switch between sampled triangles and the raster shadow mask
+                        self.shadow_renderer.raster = not self.shadow_renderer.raster
+                    elif event.type == pg.KEYDOWN and event.key == pg.K_t:
+                        if self.pipeline is None:
+                            self.start_pipeline()
+                        else:
+                            self.stop_pipeline()
             
-            glClear(GL_COLOR_BUFFER_BIT)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
             
-            # Update square's rotation
-            self.square.update_rotation()
+            # Rotate the square, resample and classify points, build index buffers
+            frame = self.next_frame()
+            if self.recorder is not None:
+                with profiler.phase("record"):
+                    frame.record_to(self.recorder)
             
             # Draw square
-            self.square.draw()
+            with profiler.phase("draw_square"):
+                draw_segments(frame.outline, self.shadow_renderer.stream if self.shadow_renderer.use_vbo else None)
             
             # Render shadow
-            self.shadow_renderer.update()
-            self.shadow_renderer.render()
+            with profiler.phase("shadow_render"):
+                self.shadow_renderer.draw_frame(frame)
+            if self.pipeline is not None:
+                self.pipeline.release(frame)  # Its data has been copied to GL
+
+            if self.show_overlay:
+                profiler.draw_overlay()
             
-            pg.display.flip()
-            self.clock.tick(60)  # 60 FPS
+            with profiler.phase("flip"):
+                pg.display.flip()
+            with profiler.phase("tick"):
+                self.clock.tick(60)  # 60 FPS
+            profiler.end_frame()
+
+        if self.pipeline is not None:
+            self.stop_pipeline()
+        if self.recorder is not None:
+            self.recorder.close()
+        if profiler.samples:
+            print(profiler.summary())
+        if self.trace_path:
+            profiler.dump_chrome_trace(self.trace_path)
         
         self.quit()
     
@@ -45,13 +146,99 @@ class App:
         pg.quit()
 
 class Square:
+    """
+    Rotating square whose derived geometry is computed lazily.
+
+    Vertices, edges, the shapely polygon, the half-plane coefficients and the
+    bounding box are built on first access after a change and cached until
+    the rotation, center or size changes again. With a constant
+    ``rotation_speed`` each step multiplies the cached rotation matrix by a
+    precomputed step matrix instead of calling cos/sin, and it is rebuilt
+    from the angle every RENORMALIZE_EVERY steps to keep rounding drift
+    from accumulating.
+    """
+
+    RENORMALIZE_EVERY = 1024
+    SYMMETRY = np.pi / 2  # Rotation after which the square looks the same
+
     def __init__(self, side_length=6, center=(0, 0), rotation=30, rotation_speed=1):
-        self.side_length = side_length
-        self.center = np.array(center)
-        self.rotation = np.radians(rotation) 
+        self._side_length = side_length
+        self._center = np.array(center)
         self.rotation_speed = np.radians(rotation_speed)
-        self.vertices = self.generate_vertices()
-        self.polygon = Polygon(self.vertices)
+        self.rotation = np.radians(rotation)
+
+    def _invalidate(self):
+        self._cache = {}  # Derived geometry, rebuilt on first access
+
+    def _cached(self, name, build):
+        value = self._cache.get(name)
+        if value is None:
+            value = self._cache[name] = build()
+        return value
+
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation):
+        self._rotation = rotation
+        self._matrix = rotation_matrix(rotation)
+        self._steps = 0
+        self._invalidate()
+
+    @property
+    def rotation_speed(self):
+        return self._rotation_speed
+
+    @rotation_speed.setter
+    def rotation_speed(self, rotation_speed):
+        self._rotation_speed = rotation_speed
+        self._step_matrix = rotation_matrix(rotation_speed)
+
+    @property
+    def center(self):
+        return self._center
+
+    @center.setter
+    def center(self, center):
+        self._center = np.array(center)
+        self._invalidate()
+
+    @property
+    def side_length(self):
+        return self._side_length
+
+    @side_length.setter
+    def side_length(self, side_length):
+        self._side_length = side_length
+        self._invalidate()
+
+    @property
+    def vertices(self):
+        return self._cached("vertices", self.generate_vertices)
+
+    @property
+    def segments(self):
+        """(4, 2, 2) array of the square's edges."""
+        return self._cached("segments", lambda: polygon_segments(self.vertices))
+
+    @property
+    def polygon(self):
+        """Shapely Polygon of the square, only built when something asks for it."""
+        from shapely.geometry import Polygon
+
+        return self._cached("polygon", lambda: Polygon(self.vertices))
+
+    @property
+    def half_planes(self):
+        """(normals, offsets) of the edge half-planes, see geometry.half_planes."""
+        return self._cached("half_planes", lambda: half_planes(self.vertices))
+
+    @property
+    def bbox(self):
+        """(min_x, min_y, max_x, max_y) of the rotated square."""
+        return self._cached("bbox", lambda: (*self.vertices.min(axis=0), *self.vertices.max(axis=0)))
 
     def generate_vertices(self):
         hs = self.side_length / 2
@@ -62,82 +249,722 @@ class Square:
             [-hs,  hs]
         ])
         
-        # Rotation matrix
-        rotation_matrix = np.array([
-            [np.cos(self.rotation), -np.sin(self.rotation)],
-            [np.sin(self.rotation), np.cos(self.rotation)]
-        ])
-        
         # Apply rotation and translation
-        rotated_square = (square @ rotation_matrix.T) + self.center
+        rotated_square = (square @ self._matrix.T) + self.center
         return rotated_square
 
     def update_rotation(self):
-        self.rotation += self.rotation_speed
-        if self.rotation >= 2 * np.pi:
-            self.rotation -= 2 * np.pi
+        if not self.rotation_speed:
+            return
 
-        
-        self.vertices = self.generate_vertices()
-        self.polygon = Polygon(self.vertices)
+        self._rotation += self.rotation_speed
+        if self._rotation >= 2 * np.pi:
+            self._rotation -= 2 * np.pi
+
+        self._steps += 1
+        if self._steps >= self.RENORMALIZE_EVERY:
+            self._matrix = rotation_matrix(self._rotation)
+            self._steps = 0
+        else:
+            self._matrix = self._step_matrix @ self._matrix
+        self._invalidate()
+
+    def contains_points(self, points):
+        """Return a boolean mask of the (N, 2) points strictly inside the square."""
+        return points_in_convex_polygon(np.asarray(points, dtype=float).reshape(-1, 2), *self.half_planes)
+
+    def crossing_angles(self, points):
+        """
+        Return the rotations at which each point enters or leaves the square.
+
+        A point at distance d from the center lies on the boundary when the
+        nearest edge normal is arccos(side / 2d) away from its direction,
+        which happens at two rotations per quarter turn.
+
+        :return: (N, 2) angles modulo SYMMETRY, NaN for points inside the
+            incircle or outside the circumcircle, which never cross
+        """
+        offsets = np.asarray(points, dtype=float).reshape(-1, 2) - self.center
+        distance = np.sqrt(offsets[:, 0] ** 2 + offsets[:, 1] ** 2)
+        half = self.side_length / 2
+        crossing = (distance > half) & (distance < half * np.sqrt(2))
+        offsets, distance = offsets[crossing], distance[crossing]
+
+        slack = np.arccos(half / distance)
+        direction = np.arctan2(offsets[:, 1], offsets[:, 0])
+        angles = np.stack((direction - slack, direction + slack), axis=1)
+        result = np.full((len(crossing), 2), np.nan)
+        result[crossing] = angles - self.SYMMETRY * np.floor(angles / self.SYMMETRY)
+        return result
+
+    def draw(self, stream=None): #OPEN FUCKING GL RAHAHHAHAHAHAH
+        draw_outline(self.vertices, stream)
+
+def draw_outline(vertices, stream=None):
+    """Draw a closed white outline, through ``stream`` when given or in immediate mode."""
+    if stream is not None:
+        stream.draw(vertices, gl.GL_LINE_LOOP, color=(1, 1, 1))
+        return
+
+    gl.glColor3f(1, 1, 1)
+    gl.glBegin(gl.GL_LINE_LOOP)
+    for vertex in vertices:
+        gl.glVertex2f(vertex[0], vertex[1])
+    gl.glEnd()
+
+def draw_segments(segments, stream=None):
+    """Draw an (E, 2, 2) array of white line segments with one GL_LINES batch."""
+    vertices = np.asarray(segments).reshape(-1, 2)
+    if stream is not None:
+        stream.draw(vertices, gl.GL_LINES, color=(1, 1, 1))
+        return
+
+    gl.glColor3f(1, 1, 1)
+    gl.glBegin(gl.GL_LINES)
+    for x, y in vertices:
+        gl.glVertex2f(x, y)
+    gl.glEnd()
+
+class Scene:
+    """
+    Many rotating polygon occluders stored as arrays, indexed by a uniform grid.
+
+    Each shape is given in local coordinates, with any vertex count, convex
+    or not, and is placed by a center and a rotation. Shapes are padded to
+    a common vertex count by repeating their last vertex. The padding adds
+    zero-length edges that both inside tests ignore.
+
+    contains_points only runs the exact test on the (point, occluder) pairs
+    the grid reports, so its cost follows the points, not the occluder
+    count. Only occluders that rotate, or are passed to ``move``, are
+    re-placed and re-bucketed each step.
+
+    A Scene can stand in for a Square in ShadowRenderer: it has
+    update_rotation, rotation, segments and contains_points.
+    """
+
+    def __init__(self, shapes, centers, rotations=0, rotation_speeds=0, bounds=(-10, -10, 10, 10),
+                 cell_size=None, chunk=1 << 18):
+        """
+        :param shapes: sequence of (V, 2) local-space vertex arrays
+        :param centers: (N, 2) world positions
+        :param rotations: initial rotations in degrees, scalar or (N,)
+        :param rotation_speeds: degrees per step, scalar or (N,)
+        :param bounds: region covered by the grid, normally the view
+        :param cell_size: grid cell edge, defaults to the median occluder extent
+        :param chunk: candidate pairs tested at once, bounding peak memory
+        """
+        shapes = [np.asarray(shape, dtype=float).reshape(-1, 2) for shape in shapes]
+        count = len(shapes)
+        self.sizes = np.array([len(shape) for shape in shapes])
+        width = self.sizes.max()
+        self.local = np.empty((count, width, 2))
+        for i, shape in enumerate(shapes):
+            self.local[i, :len(shape)] = shape
+            self.local[i, len(shape):] = shape[-1]
+        self.convex = np.array([is_convex(shape) for shape in shapes])
+        self.orientation = np.array([-1.0 if signed_area(shape) < 0 else 1.0 for shape in shapes])
+        # Real edges: every edge before the padding, plus the closing edge
+        edge = np.arange(width)
+        self.edge_mask = (edge < self.sizes[:, None] - 1) | (edge == width - 1)
+
+        self.centers = np.array(np.broadcast_to(np.asarray(centers, dtype=float), (count, 2)))
+        self.rotation = np.radians(np.broadcast_to(np.asarray(rotations, dtype=float), count))
+        self.rotation_speed = np.radians(np.broadcast_to(np.asarray(rotation_speeds, dtype=float), count))
+        self.chunk = chunk
+
+        self.vertices = np.empty_like(self.local)
+        self.normals = np.empty_like(self.local)
+        self.offsets = np.empty((count, width))
+        self.bboxes = np.empty((count, 4))
+        ids = np.arange(count)
+        self._place(ids)
+
+        if cell_size is None:
+            cell_size = np.median(np.max(self.bboxes[:, 2:] - self.bboxes[:, :2], axis=1))
+        self.grid = UniformGrid(bounds, cell_size)
+        self.grid.update(ids, self.bboxes)
+
+    @classmethod
+    def random(cls, count, bounds=(-10, -10, 10, 10), sides=(3, 8), star_fraction=0.2, moving=1.0,
+               speed_range=(-2, 2), seed=None, **kwargs):
+        """
+        Scatter ``count`` random regular polygons and stars over ``bounds``.
+
+        Occluders are sized so that together they cover roughly the whole
+        region. A ``moving`` fraction of them get a random rotation speed
+        and the rest stay still.
+        """
+        rng = np.random.default_rng(seed)
+        x0, y0, x1, y1 = bounds
+        radius = 0.5 * np.sqrt((x1 - x0) * (y1 - y0) / count)
+        shapes = []
+        for sides_, star in zip(rng.integers(sides[0], sides[1] + 1, count), rng.random(count) < star_fraction):
+            corners = 2 * sides_ if star else sides_
+            angles = np.linspace(0, 2 * np.pi, corners, endpoint=False)
+            radii = np.where(np.arange(corners) % 2, 0.45, 1.0) if star else np.ones(corners)
+            radii *= radius * rng.uniform(0.5, 1.0)
+            shapes.append(np.column_stack((np.cos(angles), np.sin(angles))) * radii[:, None])
+        centers = rng.uniform((x0, y0), (x1, y1), (count, 2))
+        rotations = rng.uniform(0, 360, count)
+        speeds = np.where(rng.random(count) < moving, rng.uniform(*speed_range, count), 0.0)
+        return cls(shapes, centers, rotations, speeds, bounds=bounds, **kwargs)
+
+    def __len__(self):
+        return len(self.local)
+
+    def _place(self, ids):
+        """Recompute world vertices, half-planes and bounding boxes of ``ids``."""
+        if len(ids) == len(self.local):
+            ids = slice(None)  # Plain views instead of gathers and scatters
+        c = np.cos(self.rotation[ids])[:, None]
+        s = np.sin(self.rotation[ids])[:, None]
+        x, y = self.local[ids, :, 0], self.local[ids, :, 1]
+        vertices = np.empty(x.shape + (2,))
+        vertices[..., 0] = c * x - s * y + self.centers[ids, 0, None]
+        vertices[..., 1] = s * x + c * y + self.centers[ids, 1, None]
+
+        edges = np.roll(vertices, -1, axis=1) - vertices
+        normals = np.stack((edges[..., 1], -edges[..., 0]), axis=-1) * self.orientation[ids, None, None]
+        offsets = np.einsum("ovk,ovk->ov", normals, vertices)
+        offsets[~self.edge_mask[ids]] = np.inf  # Padding edges accept every point
+
+        self.vertices[ids] = vertices
+        self.normals[ids] = normals
+        self.offsets[ids] = offsets
+        x, y = vertices[..., 0], vertices[..., 1]
+        self.bboxes[ids] = np.column_stack((x.min(axis=1), y.min(axis=1), x.max(axis=1), y.max(axis=1)))
+
+    def _refresh(self, ids):
+        self._place(ids)
+        self.grid.update(ids, self.bboxes[ids])
+
+    def move(self, ids, centers=None, rotations=None):
+        """Reposition some occluders; ``rotations`` are in radians like ``rotation``."""
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if centers is not None:
+            self.centers[ids] = centers
+        if rotations is not None:
+            rotation = self.rotation.copy()
+            rotation[ids] = rotations
+            self.rotation = rotation
+        self._refresh(ids)
+
+    def update_rotation(self):
+        moving = np.flatnonzero(self.rotation_speed)
+        if len(moving) == 0:
+            return
+        # Replace rather than modify, so frames holding the old array keep their snapshot
+        rotation = self.rotation.copy()
+        rotation[moving] = (rotation[moving] + self.rotation_speed[moving]) % (2 * np.pi)
+        self.rotation = rotation
+        self._refresh(moving)
+
+    @property
+    def segments(self):
+        """(E, 2, 2) array of every occluder edge, padding left out."""
+        return np.stack((self.vertices, np.roll(self.vertices, -1, axis=1)), axis=2)[self.edge_mask]
+
+    def contains_points(self, points):
+        """Return a boolean mask of the (N, 2) points strictly inside any occluder."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        inside = np.zeros(len(points), dtype=bool)
+        point_index, items = self.grid.query_points(points)
+        for first in range(0, len(items), self.chunk):
+            p = point_index[first:first + self.chunk]
+            o = items[first:first + self.chunk]
+            xy = points[p]
+
+            # Cheap bounding-box rejection before the per-edge tests
+            box = self.bboxes[o]
+            near = np.all((xy > box[:, :2]) & (xy < box[:, 2:]), axis=1)
+            p, o, xy = p[near], o[near], xy[near]
+
+            hit = np.empty(len(p), dtype=bool)
+            convex = self.convex[o]
+            if convex.any():
+                oc = o[convex]
+                hit[convex] = np.all(np.einsum("pk,pvk->pv", xy[convex], self.normals[oc]) < self.offsets[oc], axis=1)
+            if not convex.all():
+                hit[~convex] = self._crossing(xy[~convex], o[~convex])
+            inside[p[hit]] = True
+        return inside
+
+    def _crossing(self, xy, ids):
+        """Crossing-number test of each point against its own occluder."""
+        v = self.vertices[ids]
+        w = np.roll(v, -1, axis=1)
+        x, y = xy[:, 0, None], xy[:, 1, None]
+        straddles = (v[..., 1] > y) != (w[..., 1] > y)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = v[..., 0] + (y - v[..., 1]) * (w[..., 0] - v[..., 0]) / (w[..., 1] - v[..., 1])
+        return np.count_nonzero(straddles & (x < x_cross), axis=1) % 2 == 1
+
+    def draw(self, stream=None):
+        draw_segments(self.segments, stream)
+
+def random_triangle_indices(n, rng):
+    """
+    Return an (n, 3) int32 index buffer pairing every point with two random partners.
+
+    Row i is (i, j, k) with j and k distinct from each other and from i. Both
+    partners are drawn as offsets from the anchor in one vectorized step, the
+    second from one fewer choice and shifted past the first.
+    """
+    anchors = np.arange(n)
+    first = rng.integers(1, n, n)  # Offset in [1, n - 1]
+    second = rng.integers(1, n - 1, n)  # Offset in [1, n - 2], then skip over first
+    second += second >= first
+    return np.column_stack((anchors, (anchors + first) % n, (anchors + second) % n)).astype(np.int32)
+
+def mask_triangle_indices(mask, rng):
+    """Return an (n, 3) index buffer into the full point array triangulating the masked points."""
+    members = np.flatnonzero(mask)
+    if len(members) < 3:
+        return np.empty((0, 3), dtype=np.int32)
+    return members[random_triangle_indices(len(members), rng)].astype(np.int32)
+
+class ShadowFrame:
+    """Everything needed to draw one frame, filled by ShadowRenderer.prepare."""
+
+    __slots__ = ("rotation", "outline", "points", "inside", "batches", "mask", "coverage")
+
+    def __init__(self):
+        self.rotation = 0.0
+        self.outline = None  # (E, 2, 2) occluder edges
+        self.points = None
+        self.inside = None
+        self.batches = ()  # (index buffer, color) pairs for draw_indexed
+        self.mask = None  # (h, w) uint8 shadow texture in raster mode
+        self.coverage = 0.0  # Fraction of the view covered, raster mode only
+
+    def record_to(self, recorder):
+        """Append this frame to a FrameRecorder."""
+        fields = {"rotation": self.rotation, "outline": self.outline}
+        if self.mask is not None:
+            fields.update(mask=self.mask, coverage=self.coverage)
+        else:
+            fields.update(points=self.points, inside=self.inside)
+            if self.batches:
+                (outside, _), (inside, _) = self.batches
+                fields.update(outside_triangles=outside, inside_triangles=inside)
+        recorder.record(**fields)
+
+    @classmethod
+    def from_record(cls, step, rng=None):
+        """
+        Rebuild a drawable frame from one FrameArchive frame written by record_to.
+
+        Frames recorded without triangles, e.g. by headless runs, are
+        triangulated from their inside mask with ``rng``.
+        """
+        frame = cls()
+        frame.rotation = step["rotation"]
+        frame.outline = step["outline"]
+        if "coverage" in step:
+            frame.mask = step["mask"]
+            frame.coverage = float(step["coverage"])
+            return frame
+        frame.points = step["points"]
+        frame.inside = step["inside"]
+        if len(step.get("outside_triangles", ())) or len(step.get("inside_triangles", ())):
+            outside, inside = step["outside_triangles"], step["inside_triangles"]
+        else:
+            rng = np.random.default_rng() if rng is None else rng
+            outside = mask_triangle_indices(~frame.inside, rng)
+            inside = mask_triangle_indices(frame.inside, rng)
+        frame.batches = (
+            (outside, (0.3, 0.3, 0.3)),  # Darker color for outside points
+            (inside, (0.6, 0.6, 0.6)),  # Lighter color for inside points
+        )
+        return frame
+
+class ShadowMask:
+    """
+    Rasterize occluder coverage onto a fixed grid, drawn as one texture.
+
+    The cost depends on the resolution and the occluders' outlines, not on
+    a sample count. Works for a Square or a Scene, through their
+    ``vertices`` arrays, with anti-aliased coverage along x.
+    """
+
+    # Gray levels matching the triangle mode's outside and inside colors
+    OUTSIDE = 0.3 * 255
+    INSIDE = 0.6 * 255
+
+    def __init__(self, occluder, resolution=512, bounds=(-10, -10, 10, 10)):
+        self.occluder = occluder
+        self.resolution = resolution
+        self.bounds = bounds
+        self.texture = MaskTexture()
+
+    def coverage(self):
+        """Return a (resolution, resolution) float array of the covered fraction of each pixel."""
+        return polygon_coverage(self.occluder.vertices, self.bounds, (self.resolution, self.resolution))
+
+    def rasterize(self, frame=None):
+        """Return the uint8 shadow mask, also storing it and the covered fraction in ``frame``."""
+        coverage = self.coverage()
+        mask = (self.OUTSIDE + (self.INSIDE - self.OUTSIDE) * coverage).astype(np.uint8)
+        if frame is not None:
+            frame.mask = mask
+            frame.coverage = float(coverage.mean())
+        return mask
+
+    def draw(self, mask):
+        self.texture.draw(self.bounds, mask)
+
+class SamplePool:
+    """
+    Persistent sample points whose inside flags are updated incrementally.
+
+    Every step replaces the ``refresh`` fraction of the pool that has lived
+    longest with fresh uniform samples and classifies only those. The other
+    points keep their flags unless the occluder's rotation since the last
+    step swept an edge across them. For a Square each point between the
+    in- and circumcircle crosses the boundary at two rotations per quarter
+    turn (``crossing_angles``). Those angles are kept sorted, so the points
+    to reclassify are found with two binary searches. Occluders without
+    ``crossing_angles``, such as a Scene, and any change of the square's
+    center or size reclassify the whole pool.
+
+    :param occluder: Square or Scene the points are classified against
+    :param points: (N, 2) initial samples, updated in place
+    :param refresh: fraction of the pool replaced per step
+    :param rng: NumPy Generator for the replacement samples
+    :param bounds: (low, high) range of both sample coordinates
+    """
+
+    SLACK = 1e-9  # Radians added around the swept rotation to absorb rounding
+
+    def __init__(self, occluder, points, refresh, rng, bounds=(-10, 10)):
+        self.occluder = occluder
+        self.points = points
+        self.refresh = refresh
+        self.rng = rng
+        self.bounds = bounds
+        self.cursor = 0  # Next slot to replace, so every point lives 1 / refresh steps
+        self.stamps = np.zeros(len(points), dtype=np.int64)  # Bumped whenever a slot is replaced
+        self.reclassified = 0  # Points classified by the last step
+        self.reset()
+
+    @property
+    def incremental(self):
+        return hasattr(self.occluder, "crossing_angles")
+
+    def _shape_key(self):
+        return tuple(self.occluder.center), self.occluder.side_length
+
+    def reset(self):
+        """Classify the whole pool and rebuild the crossing index."""
+        self.inside = self.occluder.contains_points(self.points)
+        self.reclassified = len(self.points)
+        self.rotation = self.occluder.rotation
+        self.angles = np.empty(0)  # Sorted crossing angles
+        self.owners = np.empty(0, dtype=np.int64)  # Point of every angle
+        self.owner_stamps = np.empty(0, dtype=np.int64)  # Stamp of the point when its angles were added
+        if self.incremental:
+            self.key = self._shape_key()
+            self._index(np.arange(len(self.points)))
+
+    def _index(self, ids):
+        """Merge the crossing angles of points ``ids`` into the sorted index."""
+        angles = self.occluder.crossing_angles(self.points[ids]).ravel()
+        crossing = ~np.isnan(angles)
+        angles, owners = angles[crossing], np.repeat(ids, 2)[crossing]
+        order = np.argsort(angles)
+        angles, owners = angles[order], owners[order]
+
+        # Replaced points leave stale entries behind, dropped once they outnumber the live ones
+        live = self.owner_stamps == self.stamps[self.owners]
+        if 2 * np.count_nonzero(live) < len(live):
+            self.angles, self.owners, self.owner_stamps = self.angles[live], self.owners[live], self.owner_stamps[live]
+
+        positions = np.searchsorted(self.angles, angles)
+        self.angles = np.insert(self.angles, positions, angles)
+        self.owners = np.insert(self.owners, positions, owners)
+        self.owner_stamps = np.insert(self.owner_stamps, positions, self.stamps[owners])
+
+    def swept(self, start, stop):
+        """
+        Return the points that may have crossed the boundary between rotations ``start`` and ``stop``.
+
+        A point whose two crossings both fall in the swept arc is listed twice.
+        """
+        period = self.occluder.SYMMETRY
+        span = (stop - start) % period
+        if span > period / 2:
+            # Every point crosses twice per period, so the shorter arc flips the same points
+            start, span = stop, period - span
+        low = (start - self.SLACK) % period
+        high = low + span + 2 * self.SLACK
+        first, last = np.searchsorted(self.angles, (low, high))
+        entries = np.arange(first, last)
+        if high > period:
+            entries = np.concatenate((entries, np.arange(np.searchsorted(self.angles, high - period))))
+        owners = self.owners[entries]
+        return owners[self.owner_stamps[entries] == self.stamps[owners]]
+
+    def step(self):
+        """Replace the oldest samples and bring every inside flag up to date."""
+        count = min(int(round(self.refresh * len(self.points))), len(self.points))
+        ids = (self.cursor + np.arange(count)) % max(len(self.points), 1)
+        self.cursor = (self.cursor + count) % max(len(self.points), 1)
+        self.points[ids] = self.rng.uniform(*self.bounds, (count, 2))
+        self.stamps[ids] += 1
+
+        if not self.incremental or count == len(self.points) or self._shape_key() != self.key:
+            self.reset()
+            return self.inside
+
+        swept = self.swept(self.rotation, self.occluder.rotation)
+        self.rotation = self.occluder.rotation
+        changed = np.concatenate((swept, ids))  # Repeats are classified twice, identically
+        self.inside[changed] = self.occluder.contains_points(self.points[changed])
+        self.reclassified = len(changed)
+        self._index(ids)
+        return self.inside
 
-    def draw(self): #OPEN FUCKING GL RAHAHHAHAHAHAH
-        glColor3f(1, 1, 1)
-        glBegin(GL_LINE_LOOP)
-        for vertex in self.vertices:
-            glVertex2f(vertex[0], vertex[1])
-        glEnd()
 
 class ShadowRenderer:
-    def __init__(self, square, num_points=1000):
-        self.square = square
+    def __init__(self, square, num_points=1000, use_vbo=True, seed=None, raster=False, resolution=512,
+                 refresh=None):
+        self.square = square  # A Square, or any occluder with the same interface such as a Scene
+        self.raster = raster  # Draw a rasterized mask instead of sampled triangles
+        self.shadow_mask = ShadowMask(square, resolution)
         self.num_points = num_points
-        self.points = np.random.uniform(-10, 10, (self.num_points, 2))
+        self.use_vbo = use_vbo  # False falls back to immediate mode
+        self.stream = VertexStream()
+        self.rng = np.random.default_rng(seed)
+        self.points = self.rng.uniform(-10, 10, (self.num_points, 2))
+        # With a refresh fraction the points persist and only that share is resampled per frame
+        self.pool = SamplePool(square, self.points, refresh, self.rng) if refresh is not None else None
     
     def update(self):
         """Update points each frame to simulate real-time randomization."""
-        self.points = np.random.uniform(-10, 10, (self.num_points, 2))
+        if self.pool is not None:
+            self.pool.step()
+            return
+        self.points = self.rng.uniform(-10, 10, (self.num_points, 2))
     
+    def classify(self):
+        """Return a boolean mask of the current points that fall inside the square."""
+        return self.square.contains_points(self.points)
+
+    def triangle_indices(self, mask):
+        """Return an (n, 3) index buffer into self.points triangulating the masked points."""
+        return mask_triangle_indices(mask, self.rng)
+
+    def prepare(self, frame, triangulate=True):
+        """
+        Advance the square and the points one step and fill ``frame`` with what to draw.
+
+        Touches only NumPy state, never GL, so it can run on a worker thread.
+        Every array stored in ``frame`` is freshly allocated, so a frame still
+        being drawn is never overwritten.
+        """
+        self.square.update_rotation()
+        frame.rotation = self.square.rotation
+        frame.outline = self.square.segments
+        if self.raster:
+            self.shadow_mask.rasterize(frame)
+            frame.points = frame.inside = None
+            frame.batches = ()
+            return frame
+
+        frame.mask = None
+        self.update()
+        if self.pool is not None:
+            # The pool is updated in place, so the frame gets its own copy
+            inside = self.pool.inside.copy()
+            frame.points = self.points.copy()
+        else:
+            inside = self.classify()
+            frame.points = self.points
+        frame.inside = inside
+        frame.batches = (
+            (self.triangle_indices(~inside), (0.3, 0.3, 0.3)),  # Darker color for outside points
+            (self.triangle_indices(inside), (0.6, 0.6, 0.6)),  # Lighter color for inside points
+        ) if triangulate else ()
+        return frame
+
+    def draw_frame(self, frame):
+        """Draw a frame filled by prepare()."""
+        if frame.mask is not None:
+            self.shadow_mask.draw(frame.mask)
+            return
+        self.draw_indexed(frame.points, frame.batches)
+
     def render(self):
         """Render shadow by grouping points into triangles."""
-        in_square = []
-        out_square = []
+        inside = self.classify() if self.pool is None else self.pool.inside
+        self.draw_indexed(self.points, (
+            (self.triangle_indices(~inside), (0.3, 0.3, 0.3)),  # Darker color for outside points
+            (self.triangle_indices(inside), (0.6, 0.6, 0.6)),  # Lighter color for inside points
+        ))
 
-        for point in self.points:
-            shapely_point = Point(point[0], point[1])
-            if self.square.polygon.contains(shapely_point):
-                in_square.append(point)
-            else:
-                out_square.append(point)
+    def draw_indexed(self, vertices, batches):
+        """Draw (index buffer, color) batches of triangles over one shared vertex array."""
+        if self.use_vbo:
+            self.stream.upload(vertices)
+            for indices, color in batches:
+                self.stream.draw_elements(indices, gl.GL_TRIANGLES, color)
+            return
 
-        glColor3f(0.3, 0.3, 0.3)  # Darker color for outside points
-        self.draw_triangles(out_square)
-        
-        glColor3f(0.6, 0.6, 0.6)  # Lighter color for inside points
-        self.draw_triangles(in_square)
+        for indices, color in batches:
+            if color is not None:
+                gl.glColor3f(*color)
+            gl.glBegin(gl.GL_TRIANGLES)
+            for x, y in vertices[indices.ravel()]:
+                gl.glVertex2f(x, y)
+            gl.glEnd()
 
     def draw_triangles(self, points):
         """Draw points as connected triangles with random point selection."""
         if len(points) < 3:
             return
-        
-        glBegin(GL_TRIANGLES)
-        for i in range(len(points)):
-            # Select 2 random indices (distinct) from the points list using numpy
-            random_indices = np.random.choice(len(points), size=2, replace=False)
-        
-            # Retrieve the points from the random indices
-            random_point1 = points[random_indices[0]]
-            random_point2 = points[random_indices[1]]
-        
-            # Render the triangle with the current point and two random points
-            glVertex2f(points[i][0], points[i][1])
-            glVertex2f(random_point1[0], random_point1[1])
-            glVertex2f(random_point2[0], random_point2[1])
-        
-        glEnd()
+        self.draw_indexed(points, ((random_triangle_indices(len(points), self.rng), None),))
+
+def analyze_recording(path, start=0, stop=None):
+    """
+    Summarize frames [start, stop) of a recorded shadow run without loading the rest.
+
+    :return: dict of per-frame arrays: "points" and "inside" counts (zero
+        for raster frames) and "coverage" (zero for sampled frames)
+    """
+    archive = FrameArchive(path)
+    start, stop, _ = slice(start, stop).indices(len(archive))
+    frames = stop - start
+    results = {"frames": frames, "coverage": np.zeros(frames)}
+    if "inside" in archive.fields:
+        inside, offsets = archive.field("inside", start, stop)
+        counts = np.concatenate(([0], np.cumsum(inside, dtype=np.int64)))
+        results["points"] = np.diff(offsets)
+        results["inside"] = counts[offsets[1:]] - counts[offsets[:-1]]
+    else:
+        results["points"] = results["inside"] = np.zeros(frames, dtype=np.int64)
+    if "coverage" in archive.fields:
+        coverage, offsets = archive.field("coverage", start, stop)
+        has_coverage = np.diff(offsets) > 0
+        results["coverage"][has_coverage] = coverage
+    return results
+
+def run_headless(steps=1000, num_points=1000, seed=None, keep_masks=False, pipelined=False, occluders=None,
+                 moving=1.0, resolution=None, record=None, refresh=None):
+    """
+    Step the shadow simulation with no window, no GL and no frame cap.
+
+    :param steps: number of simulation steps
+    :param num_points: sample points per step
+    :param seed: seed for reproducible runs
+    :param keep_masks: also return every step's (num_points,) inside mask
+    :param pipelined: prepare steps on a FramePipeline worker thread,
+        which must give the same results as the serial loop
+    :param occluders: classify against a random Scene of this many
+        occluders instead of the single square
+    :param moving: fraction of the Scene's occluders that rotate
+    :param resolution: rasterize a shadow mask of this size each step
+        instead of sampling points
+    :param record: archive directory every step is recorded to
+    :param refresh: keep the samples between steps and replace only this
+        fraction per step, reclassifying just the replaced and swept points
+    :return: dict of per-step arrays ("rotation", and "inside" or
+        "coverage" in raster mode) plus "masks" when requested, "elapsed"
+        seconds and "steps_per_second"
+    """
+    square = Square(side_length=6, center=(0, 0), rotation=30, rotation_speed=0.5)
+    if occluders:
+        square = Scene.random(occluders, moving=moving, seed=seed)
+    raster = resolution is not None
+    shadow_renderer = ShadowRenderer(square, num_points=num_points, seed=seed, raster=raster,
+                                     resolution=resolution or 512, refresh=refresh)
+
+    results = {"rotation": np.empty((steps,) + np.shape(square.rotation))}
+    if raster:
+        results["coverage"] = np.empty(steps)
+    else:
+        results["inside"] = np.empty(steps, dtype=np.int64)
+    if keep_masks:
+        shape = (resolution, resolution) if raster else (num_points,)
+        results["masks"] = np.empty((steps,) + shape, dtype=np.uint8 if raster else bool)
+
+    def prepare(frame):
+        return shadow_renderer.prepare(frame, triangulate=False)
+
+    pipeline = FramePipeline(prepare, (ShadowFrame(), ShadowFrame())) if pipelined else None
+    recorder = FrameRecorder(record, metadata={"kind": "shadow"}) if record is not None else None
+    frame = ShadowFrame()
+    start = time.perf_counter()
+    try:
+        for step in range(steps):
+            if pipeline is not None:
+                frame = pipeline.acquire()
+                if frame is None:
+                    raise pipeline.error
+            else:
+                prepare(frame)
+
+            results["rotation"][step] = frame.rotation
+            if raster:
+                results["coverage"][step] = frame.coverage
+            else:
+                results["inside"][step] = np.count_nonzero(frame.inside)
+            if keep_masks:
+                results["masks"][step] = frame.mask if raster else frame.inside
+            if recorder is not None:
+                frame.record_to(recorder)
+            if pipeline is not None:
+                pipeline.release(frame)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+        if recorder is not None:
+            recorder.close()
+    elapsed = time.perf_counter() - start
+
+    results["elapsed"] = elapsed
+    results["steps_per_second"] = steps / elapsed if elapsed > 0 else float("inf")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rotating square shadow simulation.")
+    parser.add_argument("--headless", action="store_true", help="step the simulation without a window and report steps/s")
+    parser.add_argument("--steps", type=int, default=1000, help="steps to run in headless mode")
+    parser.add_argument("--points", type=int, default=1000, help="sample points per step")
+    parser.add_argument("--refresh", type=float, default=None,
+                        help="keep the sample pool between frames and resample only this fraction of it per frame")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for headless runs")
+    parser.add_argument("--profile", action="store_true", help="time frame phases and show the overlay (toggle with P)")
+    parser.add_argument("--trace", default=None, help="write a Chrome trace of frame phases to this path on exit")
+    parser.add_argument("--occluders", type=int, default=None, help="use a random scene of this many occluders")
+    parser.add_argument("--moving", type=float, default=1.0, help="fraction of scene occluders that rotate")
+    parser.add_argument("--raster", action="store_true", help="draw a rasterized shadow mask (toggle with R)")
+    parser.add_argument("--resolution", type=int, default=512, help="shadow mask resolution in raster mode")
+    parser.add_argument("--record", default=None, help="record every frame to this archive directory")
+    parser.add_argument("--replay", default=None, help="draw, or with --headless summarize, a recorded archive")
+    parser.add_argument("--frames", default="0:", help="START:STOP range of recorded frames to replay")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="prepare the next frame on a worker thread while drawing (toggle with T)")
+    args = parser.parse_args(argv)
+    frames = tuple(int(bound) if bound else None for bound in args.frames.split(":"))
+
+    if args.headless and args.replay is not None:
+        summary = analyze_recording(args.replay, *frames)
+        print(f"{summary['frames']} frames, mean inside {summary['inside'].mean():.1f} "
+              f"of {summary['points'].mean():.1f} points, mean coverage {summary['coverage'].mean():.2%}")
+    elif args.headless:
+        results = run_headless(args.steps, args.points, args.seed, pipelined=args.pipeline,
+                               occluders=args.occluders, moving=args.moving,
+                               resolution=args.resolution if args.raster else None, record=args.record,
+                               refresh=args.refresh)
+        print(f"{args.steps} steps in {results['elapsed']:.3f}s ({results['steps_per_second']:.1f} steps/s)")
+    else:
+        myApp = App(profile=args.profile, trace_path=args.trace, pipelined=args.pipeline,
+                    occluders=args.occluders, moving=args.moving, raster=args.raster, resolution=args.resolution,
+                    record=args.record, replay=args.replay, frames=frames, num_points=args.points,
+                    refresh=args.refresh)
+        myApp.mainLoop()
+        myApp.quit()
 
 if __name__ == "__main__":
-    myApp = App()
-    myApp.mainLoop()
-    myApp.quit()
+    main()
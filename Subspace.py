@@ -9,62 +9,598 @@
 import numpy as np
 
 class Triangle:
+    """
+    Lightweight view of one triangle.
+
+    Triangles built directly own a tiny (3, 3) vertex array; triangles read
+    from a Shape are views into the shape's shared vertex and face arrays.
+    """
+
+    __slots__ = ("_vertices", "_face")
+
     def __init__(self, v1, v2, v3):
-        self.v1 = np.array(v1)
-        self.v2 = np.array(v2)
-        self.v3 = np.array(v3)
+        self._vertices = np.array([v1, v2, v3], dtype=float)
+        self._face = (0, 1, 2)
+
+    @classmethod
+    def view(cls, vertices, face):
+        """Wrap row ``face`` of an index array over a shared vertex array without copying."""
+        triangle = cls.__new__(cls)
+        triangle._vertices = vertices
+        triangle._face = face
+        return triangle
+
+    @property
+    def v1(self):
+        return self._vertices[self._face[0]]
+
+    @property
+    def v2(self):
+        return self._vertices[self._face[1]]
+
+    @property
+    def v3(self):
+        return self._vertices[self._face[2]]
+
+def moller_trumbore(origins, directions, v0, edge1, edge2, cull_backfaces=False, eps=1e-9):
+    """
+    Moller-Trumbore ray/triangle test over broadcastable arrays.
+
+    All inputs have a trailing axis of 3 and broadcast against each other, so
+    (R, 1, 3) rays against (1, T, 3) triangles test every pair while matching
+    (P, 3) arrays test P ray/triangle pairs.
+
+    :return: (t, u, v) where t is inf for misses and (u, v) are the
+        barycentric weights of the second and third vertex
+    """
+    p = np.cross(directions, edge2)
+    det = np.sum(edge1 * p, axis=-1)
+    # Front faces have a (v2 - v1) x (v3 - v1) normal pointing against the ray
+    valid = det > eps if cull_backfaces else np.abs(det) > eps
+    with np.errstate(divide="ignore", invalid="ignore"):
+        inv_det = 1.0 / det
+        s = origins - v0
+        u = np.sum(s * p, axis=-1) * inv_det
+        q = np.cross(s, edge1)
+        v = np.sum(directions * q, axis=-1) * inv_det
+        t = np.sum(edge2 * q, axis=-1) * inv_det
+        # Parallel rays leave NaNs here, which compare False
+        valid &= (u >= 0) & (v >= 0) & (u + v <= 1) & (t > eps)
+    return np.where(valid, t, np.inf), u, v
 
 class Shape:
-    def __init__(self):
-        self.triangles = []
+    """
+    Indexed triangle mesh.
+
+    :param vertices: (V, 3) float array of unique vertex positions
+    :param faces: (T, 3) int32 array of vertex indices, one row per triangle
+    """
+
+    def __init__(self, vertices=None, faces=None):
+        if vertices is None:
+            vertices = np.empty((0, 3))
+        if faces is None:
+            faces = np.empty((0, 3), dtype=np.int32)
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        self.faces = np.asarray(faces, dtype=np.int32).reshape(-1, 3)
+
+    @classmethod
+    def concatenate(cls, shapes):
+        """Merge shapes into one shape whose arrays hold every mesh back to back."""
+        shapes = list(shapes)
+        if not shapes:
+            return cls()
+        counts = np.array([len(shape.vertices) for shape in shapes])
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        vertices = np.concatenate([shape.vertices for shape in shapes])
+        faces = np.concatenate([shape.faces + offset for shape, offset in zip(shapes, offsets)])
+        return cls(vertices, faces.astype(np.int32))
+
+    @property
+    def triangles(self):
+        """Triangle views over the shared arrays, for code written against the old list."""
+        return [Triangle.view(self.vertices, face) for face in self.faces]
 
     def add_triangle(self, triangle):
-        self.triangles.append(triangle)
+        """Append a triangle with its own three vertices."""
+        start = len(self.vertices)
+        self.vertices = np.concatenate((self.vertices, [triangle.v1, triangle.v2, triangle.v3]))
+        self.faces = np.concatenate((self.faces, np.array([[start, start + 1, start + 2]], dtype=np.int32)))
+
+    def triangle_array(self):
+        """Return the triangles as a (T, 3, 3) array of vertex positions."""
+        return self.vertices[self.faces]
+
+    def intersect_rays(self, origins, directions, cull_backfaces=False, max_pairs=1 << 20):
+        """
+        Find the nearest triangle hit for a batch of rays.
+
+        Every ray is tested against every triangle with broadcasting. Rays are
+        processed in chunks so at most ``max_pairs`` ray/triangle pairs are
+        live at once, which bounds peak memory for large batches.
+
+        :param origins: (R, 3) ray origins
+        :param directions: (R, 3) ray directions, not necessarily normalized
+        :param cull_backfaces: ignore triangles facing away from the ray
+        :param max_pairs: upper bound on ray/triangle pairs per chunk
+        :return: (t, triangle, barycentric) with shapes (R,), (R,) and (R, 2);
+            misses have t == inf, triangle == -1 and barycentric == nan
+        """
+        origins = np.asarray(origins, dtype=float).reshape(-1, 3)
+        directions = np.broadcast_to(np.asarray(directions, dtype=float), origins.shape)
+        count = len(origins)
+
+        t_near = np.full(count, np.inf)
+        triangle = np.full(count, -1, dtype=np.intp)
+        barycentric = np.full((count, 2), np.nan)
+
+        tris = self.triangle_array()
+        if len(tris) == 0:
+            return t_near, triangle, barycentric
+        v0 = tris[None, :, 0]
+        edge1 = tris[None, :, 1] - tris[None, :, 0]
+        edge2 = tris[None, :, 2] - tris[None, :, 0]
+
+        chunk = max(1, max_pairs // len(tris))
+        for start in range(0, count, chunk):
+            rows = slice(start, start + chunk)
+            t, u, v = moller_trumbore(
+                origins[rows, None], directions[rows, None], v0, edge1, edge2, cull_backfaces
+            )
+            nearest = np.argmin(t, axis=1)
+            picked = np.arange(len(nearest))
+            t = t[picked, nearest]
+            hit = np.isfinite(t)
+
+            t_near[rows] = t
+            triangle[rows] = np.where(hit, nearest, -1)
+            barycentric[rows] = np.where(
+                hit[:, None], np.column_stack((u[picked, nearest], v[picked, nearest])), np.nan
+            )
+
+        return t_near, triangle, barycentric
+
+# Unit cube corners and the 12 triangles covering its faces, wound
+# counter-clockwise seen from outside so every normal points outward
+CUBE_CORNERS = np.array([
+    [-0.5, -0.5, -0.5],
+    [ 0.5, -0.5, -0.5],
+    [ 0.5,  0.5, -0.5],
+    [-0.5,  0.5, -0.5],
+    [-0.5, -0.5,  0.5],
+    [ 0.5, -0.5,  0.5],
+    [ 0.5,  0.5,  0.5],
+    [-0.5,  0.5,  0.5],
+])
+
+CUBE_FACES = np.array([
+    (0, 2, 1),
+    (2, 0, 3),
+    (4, 5, 6),
+    (6, 7, 4),
+    (0, 5, 4),
+    (5, 0, 1),
+    (1, 6, 5),
+    (6, 1, 2),
+    (2, 7, 6),
+    (7, 2, 3),
+    (3, 4, 7),
+    (4, 3, 0),
+], dtype=np.int32)
 
 class Cube(Shape):
 
-    def __init__(self, center=(0, 0, 0), size=1.0):
+    def __init__(self, center=(0, 0, 0), size=1.0, rotation=None):
 
         """
         Represents a cube.
         
         :param center: Center of the cube (x, y, z)
         :param size: Size of the cube
+        :param rotation: Optional 3x3 rotation matrix applied about the center
         """
-        super().__init__()
         self.center = np.array(center)
         self.size = size
+        self.rotation = np.eye(3) if rotation is None else np.asarray(rotation, dtype=float)
         
-        # Define vertices of the cube
-        vertices = [
-            self.center + np.array([-size/2, -size/2, -size/2]),
-            self.center + np.array([size/2, -size/2, -size/2]),
-            self.center + np.array([size/2, size/2, -size/2]),
-            self.center + np.array([-size/2, size/2, -size/2]),
-            self.center + np.array([-size/2, -size/2, size/2]),
-            self.center + np.array([size/2, -size/2, size/2]),
-            self.center + np.array([size/2, size/2, size/2]),
-            self.center + np.array([-size/2, size/2, size/2]),
-        ]
-        
-        # Define triangles of the cube
-        triangles = [
-            (vertices[0], vertices[1], vertices[2]),
-            (vertices[2], vertices[3], vertices[0]),
-            (vertices[4], vertices[5], vertices[6]),
-            (vertices[6], vertices[7], vertices[4]),
-            (vertices[0], vertices[4], vertices[5]),
-            (vertices[5], vertices[1], vertices[0]),
-            (vertices[1], vertices[5], vertices[6]),
-            (vertices[6], vertices[2], vertices[1]),
-            (vertices[2], vertices[6], vertices[7]),
-            (vertices[7], vertices[3], vertices[2]),
-            (vertices[3], vertices[7], vertices[4]),
-            (vertices[4], vertices[0], vertices[3]),
-        ]
-        
-        # Add triangles to the shape
-        for v1, v2, v3 in triangles:
-            self.add_triangle(Triangle(v1, v2, v3))
+        # 8 shared vertices and 12 index triples instead of per-triangle copies
+        super().__init__(self.center + size * CUBE_CORNERS @ self.rotation.T, CUBE_FACES)
         
-cube = Cube((1,2,2), 4)
\ No newline at end of file
+def quaternions_to_matrices(quaternions):
+    """Convert (N, 4) unit quaternions (w, x, y, z) to (N, 3, 3) rotation matrices."""
+    return _quaternion_matrices(*np.ascontiguousarray(np.asarray(quaternions, dtype=float).reshape(-1, 4).T))
+
+def _quaternion_matrices(w, x, y, z):
+    m = np.empty((len(w), 3, 3))
+    m[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    m[:, 0, 1] = 2 * (x * y - z * w)
+    m[:, 0, 2] = 2 * (x * z + y * w)
+    m[:, 1, 0] = 2 * (x * y + z * w)
+    m[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    m[:, 1, 2] = 2 * (y * z - x * w)
+    m[:, 2, 0] = 2 * (x * z - y * w)
+    m[:, 2, 1] = 2 * (y * z + x * w)
+    m[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    return m
+
+def euler_to_matrices(angles):
+    """Convert (N, 3) x, y, z angles in radians to (N, 3, 3) matrices applied as Rz @ Ry @ Rx."""
+    angles = np.asarray(angles, dtype=float)
+    cx, cy, cz = np.cos(angles).T
+    sx, sy, sz = np.sin(angles).T
+    m = np.empty((len(angles), 3, 3))
+    m[:, 0, 0] = cz * cy
+    m[:, 0, 1] = cz * sy * sx - sz * cx
+    m[:, 0, 2] = cz * sy * cx + sz * sx
+    m[:, 1, 0] = sz * cy
+    m[:, 1, 1] = sz * sy * sx + cz * cx
+    m[:, 1, 2] = sz * sy * cx - cz * sx
+    m[:, 2, 0] = -sy
+    m[:, 2, 1] = cy * sx
+    m[:, 2, 2] = cy * cx
+    return m
+
+def random_rotations(count, rng, kind="quaternion"):
+    """
+    Draw (count, 3, 3) random rotation matrices.
+
+    "quaternion" samples uniformly over all rotations (Shoemake's method);
+    "euler" draws three independent angles, which is cheaper but not uniform.
+    """
+    if kind == "quaternion":
+        u1, u2, u3 = rng.random((3, count))
+        a, b = np.sqrt(1 - u1), np.sqrt(u1)
+        u2 *= 2 * np.pi
+        u3 *= 2 * np.pi
+        return _quaternion_matrices(a * np.sin(u2), a * np.cos(u2), b * np.sin(u3), b * np.cos(u3))
+    if kind == "euler":
+        return euler_to_matrices(rng.uniform(0, 2 * np.pi, (count, 3)))
+    raise ValueError(f"unknown rotation kind {kind!r}, expected 'quaternion' or 'euler'")
+
+class CubeInstances:
+    """
+    Many cubes stored as one (N, 4, 4) instance-transform array over shared template geometry.
+
+    World-space vertices and triangles are expanded only when first asked
+    for and then cached until the transforms change.
+    """
+
+    template_vertices = CUBE_CORNERS
+    template_faces = CUBE_FACES
+
+    def __init__(self, transforms):
+        self.transforms = np.asarray(transforms, dtype=float).reshape(-1, 4, 4)
+        self._vertices = None
+
+    @classmethod
+    def from_components(cls, centers, sizes, rotations):
+        """Build instances from (N, 3) centers, (N,) sizes and (N, 3, 3) rotations."""
+        centers = np.asarray(centers, dtype=float).reshape(-1, 3)
+        transforms = np.zeros((len(centers), 4, 4))
+        transforms[:, :3, :3] = np.asarray(rotations, dtype=float) * np.asarray(sizes, dtype=float).reshape(-1, 1, 1)
+        transforms[:, :3, 3] = centers
+        transforms[:, 3, 3] = 1
+        return cls(transforms)
+
+    @classmethod
+    def random(cls, count, center_range=(-10, 10), size_range=(0.5, 2.0), rotation="quaternion", seed=None):
+        """
+        Create ``count`` cubes with random centers, sizes and rotations in one vectorized pass.
+
+        :param center_range: (low, high) bounds for every center coordinate
+        :param size_range: (low, high) bounds for the edge length
+        :param rotation: "quaternion" for uniform rotations, "euler" for
+            random Euler angles, or None for axis-aligned cubes
+        :param seed: seed or np.random.Generator for reproducible scenes
+        """
+        rng = np.random.default_rng(seed)
+        centers = rng.uniform(*center_range, (count, 3))
+        sizes = rng.uniform(*size_range, count)
+        if rotation is None:
+            rotations = np.broadcast_to(np.eye(3), (count, 3, 3))
+        else:
+            rotations = random_rotations(count, rng, rotation)
+        return cls.from_components(centers, sizes, rotations)
+
+    def __len__(self):
+        return len(self.transforms)
+
+    def invalidate(self):
+        """Drop cached world-space geometry after editing ``transforms`` in place."""
+        self._vertices = None
+
+    def vertices(self):
+        """Return the (N * 8, 3) world-space vertices of every cube."""
+        if self._vertices is None:
+            linear = self.transforms[:, :3, :3]
+            offset = self.transforms[:, None, :3, 3]
+            # Batched matmul; einsum does not dispatch this contraction to BLAS
+            self._vertices = (self.template_vertices @ linear.transpose(0, 2, 1) + offset).reshape(-1, 3)
+        return self._vertices
+
+    def faces(self):
+        """Return the (N * 12, 3) int32 face indices into vertices()."""
+        offsets = np.arange(len(self), dtype=np.int32)[:, None, None] * len(self.template_vertices)
+        return (self.template_faces[None] + offsets).reshape(-1, 3)
+
+    def to_shape(self):
+        """Expand every instance into one indexed Shape, e.g. to build a BVH."""
+        return Shape(self.vertices(), self.faces())
+
+    def triangle_array(self):
+        """Return the world-space triangles as an (N * 12, 3, 3) array."""
+        return self.vertices()[self.faces()]
+
+    def cube(self, index):
+        """Return instance ``index`` as a standalone Cube."""
+        linear = self.transforms[index, :3, :3]
+        size = np.linalg.norm(linear[:, 0])
+        return Cube(self.transforms[index, :3, 3], size, linear / size)
+
+def _box_area(lo, hi):
+    """Surface area of axis-aligned boxes given (..., 3) corner arrays."""
+    d = hi - lo
+    return 2 * (d[..., 0] * d[..., 1] + d[..., 1] * d[..., 2] + d[..., 2] * d[..., 0])
+
+class BVH:
+    """
+    Bounding volume hierarchy over the triangles of a scene of shapes.
+
+    Nodes live in flat arrays in depth-first order (children always come after
+    their parent). Internal nodes store their two children in ``left`` and
+    ``right``; leaves have ``left == -1`` and own the triangles
+    ``order[start:start + count]`` of the merged scene mesh.
+
+    :param shapes: Shape or iterable of shapes making up the scene
+    :param leaf_size: stop splitting nodes with at most this many triangles
+    :param method: "sah" for a binned surface area heuristic, "median" for
+        a faster object-median split along the widest axis
+    :param bins: number of SAH bins per axis
+    """
+
+    TRAVERSAL_COST = 1.0  # SAH cost of visiting a node, relative to one triangle test
+    SAH_MIN_TRIANGLES = 64  # Smaller nodes use median splits; binning them costs more than it saves
+
+    def __init__(self, shapes, leaf_size=4, method="sah", bins=12):
+        if method not in ("sah", "median"):
+            raise ValueError(f"unknown split method {method!r}, expected 'sah' or 'median'")
+        self.shapes = [shapes] if isinstance(shapes, Shape) else list(shapes)
+        self.leaf_size = leaf_size
+        self.method = method
+        self.bins = bins
+        self.mesh = Shape.concatenate(self.shapes)
+        self.last_nodes_visited = None  # Per-ray node visits of the last traversal
+        self.build()
+
+    def build(self):
+        """Build the hierarchy from scratch over the current scene mesh."""
+        tris = self.mesh.triangle_array()
+        self._tri_min = tris.min(axis=1) if len(tris) else np.empty((0, 3))
+        self._tri_max = tris.max(axis=1) if len(tris) else np.empty((0, 3))
+        centroids = tris.mean(axis=1) if len(tris) else np.empty((0, 3))
+        self.order = np.arange(len(tris))
+
+        lo, hi, left, right, start, count, depth = [], [], [], [], [], [], []
+
+        def add_node(first, size, level):
+            ids = self.order[first:first + size]
+            lo.append(self._tri_min[ids].min(axis=0))
+            hi.append(self._tri_max[ids].max(axis=0))
+            left.append(-1)
+            right.append(-1)
+            start.append(first)
+            count.append(size)
+            depth.append(level)
+            return len(start) - 1
+
+        if len(tris):
+            stack = [add_node(0, len(tris), 0)]
+            while stack:
+                node = stack.pop()
+                first, size = start[node], count[node]
+                if size <= self.leaf_size:
+                    continue
+                split = self._split(self.order[first:first + size], centroids, lo[node], hi[node])
+                if split is None:
+                    continue
+                ids, size_left = split
+                self.order[first:first + size] = ids
+                left[node] = add_node(first, size_left, depth[node] + 1)
+                right[node] = add_node(first + size_left, size - size_left, depth[node] + 1)
+                stack.extend((right[node], left[node]))
+
+        self.node_min = np.array(lo).reshape(-1, 3)
+        self.node_max = np.array(hi).reshape(-1, 3)
+        self.left = np.array(left, dtype=np.int32)
+        self.right = np.array(right, dtype=np.int32)
+        self.start = np.array(start, dtype=np.int32)
+        self.count = np.array(count, dtype=np.int32)
+        self.depth = np.array(depth, dtype=np.int32)
+        self._prepare_triangles()
+
+    def _split(self, ids, centroids, lo, hi):
+        """Partition ``ids``; return (reordered ids, size of left part) or None to make a leaf."""
+        c = centroids[ids]
+        c_min, c_max = c.min(axis=0), c.max(axis=0)
+        extent = c_max - c_min
+        if not np.any(extent > 0):
+            # Every centroid coincides, so just halve the list to bound leaf sizes
+            return ids, len(ids) // 2
+
+        if self.method == "median" or len(ids) <= self.SAH_MIN_TRIANGLES:
+            axis = int(np.argmax(extent))
+            half = len(ids) // 2
+            return ids[np.argpartition(c[:, axis], half)], half
+
+        # Bin centroids along all three axes at once; flat axes get no valid planes
+        n, nbins = len(ids), self.bins
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scaled = np.nan_to_num((c - c_min) / extent * nbins)
+        bins = np.minimum(scaled.astype(int), nbins - 1)  # (n, 3)
+        slots = (bins + np.arange(3) * nbins).ravel()  # Axis-major bin id per (triangle, axis)
+        counts = np.bincount(slots, minlength=3 * nbins).reshape(3, nbins)
+        bin_lo = np.full((3 * nbins, 3), np.inf)
+        bin_hi = np.full((3 * nbins, 3), -np.inf)
+        np.minimum.at(bin_lo, slots, np.repeat(self._tri_min[ids], 3, axis=0))
+        np.maximum.at(bin_hi, slots, np.repeat(self._tri_max[ids], 3, axis=0))
+        bin_lo = bin_lo.reshape(3, nbins, 3)
+        bin_hi = bin_hi.reshape(3, nbins, 3)
+
+        # Bounds of everything left of / right of each of the nbins - 1 planes per axis
+        left_lo = np.minimum.accumulate(bin_lo, axis=1)[:, :-1]
+        left_hi = np.maximum.accumulate(bin_hi, axis=1)[:, :-1]
+        right_lo = np.minimum.accumulate(bin_lo[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        right_hi = np.maximum.accumulate(bin_hi[:, ::-1], axis=1)[:, ::-1][:, 1:]
+        left_count = np.cumsum(counts, axis=1)[:, :-1]
+        right_count = n - left_count
+        with np.errstate(invalid="ignore"):
+            cost = _box_area(left_lo, left_hi) * left_count + _box_area(right_lo, right_hi) * right_count
+        valid = (left_count > 0) & (right_count > 0) & (extent > 0)[:, None]
+        cost = np.where(valid, cost, np.inf)
+
+        axis, plane = np.unravel_index(np.argmin(cost), cost.shape)
+        best_cost = cost[axis, plane]
+        if not np.isfinite(best_cost):
+            return ids, n // 2
+        parent_area = _box_area(lo, hi)
+        if parent_area > 0 and self.TRAVERSAL_COST + best_cost / parent_area >= n:
+            return None  # Splitting costs more than testing every triangle here
+        best = bins[:, axis] <= plane
+        return np.concatenate((ids[best], ids[~best])), int(np.count_nonzero(best))
+
+    def _prepare_triangles(self):
+        """Cache per-triangle Moller-Trumbore inputs for traversal."""
+        tris = self.mesh.triangle_array()
+        self._v0 = tris[:, 0]
+        self._edge1 = tris[:, 1] - tris[:, 0]
+        self._edge2 = tris[:, 2] - tris[:, 0]
+
+    def refit(self, shapes=None):
+        """
+        Update node bounds after shapes moved, keeping the tree topology.
+
+        Shapes must keep their vertex and face counts. Pass the moved shapes
+        in the original order, or nothing to re-read ``self.shapes``.
+        """
+        if shapes is not None:
+            self.shapes = [shapes] if isinstance(shapes, Shape) else list(shapes)
+        vertices = np.concatenate([shape.vertices for shape in self.shapes])
+        if vertices.shape != self.mesh.vertices.shape:
+            raise ValueError("refit requires the same vertex layout, rebuild instead")
+        self.mesh.vertices = vertices
+        if not len(self.start):
+            return
+
+        tris = self.mesh.triangle_array()
+        self._tri_min = tris.min(axis=1)
+        self._tri_max = tris.max(axis=1)
+        self._prepare_triangles()
+
+        # Leaves own contiguous runs of self.order, so reduce over them directly
+        leaves = np.flatnonzero(self.left < 0)
+        leaves = leaves[np.argsort(self.start[leaves])]
+        self.node_min[leaves] = np.minimum.reduceat(self._tri_min[self.order], self.start[leaves])
+        self.node_max[leaves] = np.maximum.reduceat(self._tri_max[self.order], self.start[leaves])
+
+        # Internal nodes bottom-up, one depth level at a time
+        for level in range(self.depth.max() - 1, -1, -1):
+            nodes = np.flatnonzero((self.depth == level) & (self.left >= 0))
+            self.node_min[nodes] = np.minimum(self.node_min[self.left[nodes]], self.node_min[self.right[nodes]])
+            self.node_max[nodes] = np.maximum(self.node_max[self.left[nodes]], self.node_max[self.right[nodes]])
+
+    def intersect_rays(self, origins, directions, cull_backfaces=False):
+        """
+        Find the nearest triangle hit for a batch of rays by traversing the tree.
+
+        All rays advance together: each round slab-tests the live
+        (ray, node) pairs, runs Moller-Trumbore on the triangles of every
+        reached leaf and replaces internal nodes by their children. Nodes
+        farther away than a ray's current nearest hit are skipped.
+
+        :return: (t, triangle, barycentric) like Shape.intersect_rays, with
+            triangle indexing the merged scene mesh
+        """
+        origins = np.asarray(origins, dtype=float).reshape(-1, 3)
+        directions = np.broadcast_to(np.asarray(directions, dtype=float), origins.shape)
+        count = len(origins)
+
+        t_near = np.full(count, np.inf)
+        triangle = np.full(count, -1, dtype=np.intp)
+        barycentric = np.full((count, 2), np.nan)
+        visited = np.zeros(count, dtype=np.int64)
+        self.last_nodes_visited = visited
+        if not len(self.start) or not count:
+            return t_near, triangle, barycentric
+
+        with np.errstate(divide="ignore"):
+            inv_dir = 1.0 / directions
+
+        rays = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int32)
+        while len(rays):
+            visited += np.bincount(rays, minlength=count)
+
+            # Slab test; fmin/fmax skip the nan from 0 * inf on axis-parallel rays
+            with np.errstate(invalid="ignore"):
+                lo = (self.node_min[nodes] - origins[rays]) * inv_dir[rays]
+                hi = (self.node_max[nodes] - origins[rays]) * inv_dir[rays]
+            t_enter = np.fmax.reduce(np.fmin(lo, hi), axis=1)
+            t_exit = np.fmin.reduce(np.fmax(lo, hi), axis=1)
+            reached = (t_exit >= np.maximum(t_enter, 0)) & (t_enter <= t_near[rays])
+            rays, nodes = rays[reached], nodes[reached]
+
+            leaf = self.left[nodes] < 0
+            if np.any(leaf):
+                self._intersect_leaves(
+                    rays[leaf], nodes[leaf], origins, directions, cull_backfaces, t_near, triangle, barycentric
+                )
+
+            rays, nodes = rays[~leaf], nodes[~leaf]
+            rays = np.concatenate((rays, rays))
+            nodes = np.concatenate((self.left[nodes], self.right[nodes]))
+
+        return t_near, triangle, barycentric
+
+    def _intersect_leaves(self, rays, leaves, origins, directions, cull_backfaces, t_near, triangle, barycentric):
+        """Test (ray, leaf) pairs against the leaf triangles and keep closer hits in place."""
+        sizes = self.count[leaves]
+        pair_rays = np.repeat(rays, sizes)
+        # Position of each pair inside its leaf's run of self.order
+        run = np.arange(len(pair_rays)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        tris = self.order[np.repeat(self.start[leaves], sizes) + run]
+
+        t, u, v = moller_trumbore(
+            origins[pair_rays], directions[pair_rays], self._v0[tris], self._edge1[tris], self._edge2[tris],
+            cull_backfaces,
+        )
+
+        # Nearest pair per ray, then keep it only if it beats the current best
+        by_ray = np.lexsort((t, pair_rays))
+        first = np.ones(len(by_ray), dtype=bool)
+        first[1:] = pair_rays[by_ray[1:]] != pair_rays[by_ray[:-1]]
+        best = by_ray[first]
+        closer = t[best] < t_near[pair_rays[best]]
+        best = best[closer]
+
+        hit_rays = pair_rays[best]
+        t_near[hit_rays] = t[best]
+        triangle[hit_rays] = tris[best]
+        barycentric[hit_rays] = np.column_stack((u[best], v[best]))
+
+    def stats(self):
+        """Return node count, leaf count, depth and average nodes visited per ray of the last traversal."""
+        leaves = self.left < 0
+        return {
+            "triangles": len(self.order),
+            "nodes": len(self.start),
+            "leaves": int(np.count_nonzero(leaves)),
+            "depth": int(self.depth.max()) if len(self.depth) else 0,
+            "mean_leaf_size": float(self.count[leaves].mean()) if np.any(leaves) else 0.0,
+            "avg_nodes_visited": (
+                float(self.last_nodes_visited.mean())
+                if self.last_nodes_visited is not None and len(self.last_nodes_visited) else 0.0
+            ),
+        }
+
+if __name__ == "__main__":
+    cube = Cube((1,2,2), 4)
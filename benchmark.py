@@ -0,0 +1,202 @@
+"""
+Benchmark the simulation hot paths headlessly and track them over time.
+
+Runs point classification, batched ray casting and mesh construction over
+parameter sweeps with fixed seeds, appends every run to a JSON history file
+and flags cases that got slower than a stored baseline.
+
+    python benchmark.py                  # full sweep, compare with baseline
+    python benchmark.py --quick          # smaller sweep for a fast check
+    python benchmark.py --save-baseline  # accept this run as the new baseline
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+SEED = 12345
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_HISTORY = os.path.join(HERE, "bench_history.json")
+DEFAULT_BASELINE = os.path.join(HERE, "bench_baseline.json")
+
+
+def bench_classify(num_points):
+    """ShadowRenderer.classify over num_points samples."""
+    simulation = importlib.import_module("Simulation")
+    square = simulation.Square(side_length=6, center=(0, 0), rotation=30, rotation_speed=0.5)
+    shadow_renderer = simulation.ShadowRenderer(square, num_points=num_points, seed=SEED)
+    return shadow_renderer.classify
+
+
+def bench_triangle_indices(num_points):
+    """ShadowRenderer.triangle_indices over every sample point."""
+    simulation = importlib.import_module("Simulation")
+    square = simulation.Square(side_length=6, center=(0, 0), rotation=30, rotation_speed=0.5)
+    shadow_renderer = simulation.ShadowRenderer(square, num_points=num_points, seed=SEED)
+    mask = np.ones(num_points, dtype=bool)
+    return lambda: shadow_renderer.triangle_indices(mask)
+
+
+def bench_raster(resolution):
+    """ShadowMask.rasterize at resolution x resolution."""
+    simulation = importlib.import_module("Simulation")
+    square = simulation.Square(side_length=6, center=(0, 0), rotation=30, rotation_speed=0.5)
+    return simulation.ShadowMask(square, resolution).rasterize
+
+
+def bench_sample_pool(num_points):
+    """One rotation step of a SamplePool replacing 5% of num_points samples."""
+    simulation = importlib.import_module("Simulation")
+    square = simulation.Square(side_length=6, center=(0, 0), rotation=30, rotation_speed=0.5)
+    rng = np.random.default_rng(SEED)
+    pool = simulation.SamplePool(square, rng.uniform(-10, 10, (num_points, 2)), 0.05, rng)
+
+    def step():
+        square.update_rotation()
+        pool.step()
+    return step
+
+
+def bench_cast_rays(rays):
+    """MonteCarloRayTracer.cast_rays for one batch of rays."""
+    render = importlib.import_module("2drender")
+    ray_tracer = render.MonteCarloRayTracer(render.Square(side_length=6, center=(0, 0), rotation=30), seed=SEED)
+    return lambda: ray_tracer.cast_rays(rays)
+
+
+def bench_cubes(count):
+    """Constructing count Cube objects one at a time."""
+    subspace = importlib.import_module("Subspace")
+    rng = np.random.default_rng(SEED)
+    centers = rng.uniform(-10, 10, (count, 3))
+    sizes = rng.uniform(0.5, 2.0, count)
+    return lambda: [subspace.Cube(center, size) for center, size in zip(centers, sizes)]
+
+
+def bench_cube_instances(count):
+    """Generating count random rotated cubes and expanding their vertices."""
+    subspace = importlib.import_module("Subspace")
+    return lambda: subspace.CubeInstances.random(count, seed=SEED).vertices()
+
+
+# name -> (factory returning the timed callable, full sweep, quick sweep)
+BENCHMARKS = {
+    "classify": (bench_classify, [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], [10 ** 3, 10 ** 5]),
+    "triangle_indices": (bench_triangle_indices, [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], [10 ** 3, 10 ** 5]),
+    "raster": (bench_raster, [128, 256, 512, 1024], [128, 512]),
+    "sample_pool": (bench_sample_pool, [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6], [10 ** 3, 10 ** 5]),
+    "cast_rays": (bench_cast_rays, [1, 100, 10 ** 4, 10 ** 5], [1, 10 ** 4]),
+    "cubes": (bench_cubes, [10, 100, 1000], [10, 100]),
+    "cube_instances": (bench_cube_instances, [10 ** 3, 10 ** 4, 10 ** 5], [10 ** 3, 10 ** 4]),
+}
+
+
+def time_case(func, repeat, min_time=0.05):
+    """Return (best, median) seconds per call over ``repeat`` timed rounds."""
+    func()  # Warm up caches and lazy imports
+    start = time.perf_counter()
+    func()
+    once = time.perf_counter() - start
+    # Batch fast calls so each round lasts about min_time
+    number = max(1, int(min_time / once)) if once > 0 else 1000
+
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - start) / number)
+    return min(rounds), float(np.median(rounds))
+
+
+def run(quick=False, repeat=5, only=None, stream=sys.stdout):
+    """Run every selected benchmark case and return {case: {"best", "median"}}."""
+    results = {}
+    for name, (factory, full, short) in BENCHMARKS.items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        for param in short if quick else full:
+            case = f"{name}[{param}]"
+            best, median = time_case(factory(param), repeat)
+            results[case] = {"best": best, "median": median}
+            print(f"{case:<28} best {best * 1e3:10.3f} ms   median {median * 1e3:10.3f} ms", file=stream)
+    return results
+
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+
+def append_history(path, results):
+    """Append one run, with enough environment info to compare runs, to the history file."""
+    history = load_json(path, [])
+    history.append({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "seed": SEED,
+        "results": results,
+    })
+    write_json(path, history)
+
+
+def find_regressions(results, baseline, tolerance):
+    """Return [(case, baseline, current, ratio)] for cases slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for case, timing in results.items():
+        if case not in baseline:
+            continue
+        ratio = timing["best"] / baseline[case]
+        if ratio > 1 + tolerance:
+            regressions.append((case, baseline[case], timing["best"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark classification, ray casting and mesh construction.")
+    parser.add_argument("--quick", action="store_true", help="run the smaller parameter sweep")
+    parser.add_argument("--repeat", type=int, default=5, help="timed rounds per case")
+    parser.add_argument("--only", nargs="*", help="run benchmarks whose name contains any of these")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON file every run is appended to")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON file of baseline best times")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run's times as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging, as a fraction")
+    args = parser.parse_args(argv)
+
+    results = run(args.quick, args.repeat, args.only)
+    append_history(args.history, results)
+
+    baseline = load_json(args.baseline, {})
+    if args.save_baseline:
+        baseline.update({case: timing["best"] for case, timing in results.items()})
+        write_json(args.baseline, baseline)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for case, before, after, ratio in regressions:
+        print(f"REGRESSION {case}: {before * 1e3:.3f} ms -> {after * 1e3:.3f} ms ({ratio:.2f}x)")
+    if not baseline:
+        print("no baseline stored yet, run with --save-baseline to create one")
+    elif not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} of baseline")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""Vectorized 2D geometry kernels shared by the renderers."""
+
+import numpy as np
+
+
+def rotation_matrix(angle):
+    """Return the 2x2 counter-clockwise rotation matrix for ``angle`` radians."""
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, -s], [s, c]])
+
+
+def signed_area(vertices):
+    """Return the signed area of a closed polygon (positive when counter-clockwise)."""
+    v = np.asarray(vertices, dtype=float)
+    w = np.roll(v, -1, axis=0)
+    return 0.5 * np.sum(v[:, 0] * w[:, 1] - w[:, 0] * v[:, 1])
+
+
+def is_convex(vertices):
+    """Return True if the polygon turns the same way at every vertex."""
+    v = np.asarray(vertices, dtype=float)
+    edges = np.roll(v, -1, axis=0) - v
+    following = np.roll(edges, -1, axis=0)
+    cross = edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0]
+    return bool(np.all(cross >= 0) or np.all(cross <= 0))
+
+
+def half_planes(vertices):
+    """
+    Return the edge half-planes of a convex polygon.
+
+    A point p is strictly inside when ``normals @ p < offsets`` holds for every
+    edge. Normals point outward regardless of the winding of ``vertices``.
+    """
+    v = np.asarray(vertices, dtype=float)
+    edges = np.roll(v, -1, axis=0) - v
+    normals = np.column_stack((edges[:, 1], -edges[:, 0]))
+    if signed_area(v) < 0:
+        normals = -normals
+    offsets = np.einsum("ij,ij->i", normals, v)
+    return normals, offsets
+
+
+def points_in_convex_polygon(points, normals, offsets):
+    """Classify an (N, 2) array of points against precomputed half-planes."""
+    return np.all(points @ normals.T < offsets, axis=1)
+
+
+def points_in_polygon(points, vertices, convex=None):
+    """
+    Classify an (N, 2) array of points against a closed polygon in one pass.
+
+    :param points: (N, 2) array of sample points
+    :param vertices: (V, 2) array of polygon vertices, either winding
+    :param convex: use edge half-plane tests when True, the crossing-number
+        rule when False, and detect it from the vertices when None
+    :return: (N,) boolean mask, True for points strictly inside
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    v = np.asarray(vertices, dtype=float)
+    if convex is None:
+        convex = is_convex(v)
+    if convex:
+        return points_in_convex_polygon(points, *half_planes(v))
+
+    # Crossing number: count edges crossed by a ray cast towards +x
+    x = points[:, 0, None]
+    y = points[:, 1, None]
+    x0, y0 = v[:, 0], v[:, 1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+    straddles = (y0 > y) != (y1 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+    crossings = np.count_nonzero(straddles & (x < x_cross), axis=1)
+    return crossings % 2 == 1
+
+
+def polygon_coverage(vertices, bounds, shape):
+    """
+    Rasterize polygons into per-pixel coverage with an even-odd scanline fill.
+
+    Each pixel row is sampled along its center line, and the covered
+    fraction of every pixel along that line is exact. Overlapping polygons
+    add up and are clipped to 1.
+
+    :param vertices: (V, 2) polygon or (N, V, 2) polygons, either winding;
+        padding a polygon by repeating a vertex is harmless
+    :param bounds: (min_x, min_y, max_x, max_y) of the raster
+    :param shape: (rows, columns)
+    :return: (rows, columns) float array with row 0 at min_y
+    """
+    v = np.asarray(vertices, dtype=float)
+    if v.ndim == 2:
+        v = v[None]
+    rows, cols = shape
+    x0, y0, x1, y1 = bounds
+    dx, dy = (x1 - x0) / cols, (y1 - y0) / rows
+
+    # One (row, polygon) pair for every row center inside a polygon's y-range
+    first = np.clip(np.ceil((v[..., 1].min(axis=1) - y0) / dy - 0.5), 0, rows).astype(np.int64)
+    last = np.clip(np.floor((v[..., 1].max(axis=1) - y0) / dy - 0.5), -1, rows - 1).astype(np.int64)
+    counts = np.maximum(last - first + 1, 0)
+    owner = np.repeat(np.arange(len(v)), counts)
+    row = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # Sorted edge crossings of each row's center line, paired up even-odd
+    a = v[owner]
+    b = np.roll(a, -1, axis=1)
+    y = (y0 + (row + 0.5) * dy)[:, None]
+    straddles = (np.minimum(a[..., 1], b[..., 1]) <= y) & (y < np.maximum(a[..., 1], b[..., 1]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = a[..., 0] + (y - a[..., 1]) * (b[..., 0] - a[..., 0]) / (b[..., 1] - a[..., 1])
+    x = np.sort(np.where(straddles, x, np.inf), axis=1)
+    if x.shape[1] % 2:
+        x = np.pad(x, ((0, 0), (0, 1)), constant_values=np.inf)
+    left, right = x[:, 0::2], x[:, 1::2]
+    valid = np.isfinite(right)
+    span_row = np.broadcast_to(row[:, None], left.shape)[valid]
+    u = np.clip((left[valid] - x0) / dx, 0, cols)  # Span ends in pixel units
+    w = np.clip((right[valid] - x0) / dx, 0, cols)
+
+    # Partial end pixels directly, whole pixels in between through a
+    # difference array, both only over the band of rows that has spans
+    coverage = np.zeros((rows, cols))
+    if len(span_row) == 0:
+        return coverage
+    top, bottom = span_row.min(), span_row.max() + 1
+    width = cols + 2
+    base = (span_row - top) * width
+    lo = np.floor(u).astype(np.int64)
+    hi = np.floor(w).astype(np.int64)
+    same = lo == hi
+    apart = ~same
+    partial = np.concatenate((base[same] + lo[same], base[apart] + lo[apart], base[apart] + hi[apart]))
+    amount = np.concatenate(((w - u)[same], (lo + 1 - u)[apart], (w - hi)[apart]))
+    size = (bottom - top) * width
+    band = np.bincount(partial, amount, minlength=size)
+    steps = np.bincount(
+        np.concatenate((base[apart] + lo[apart] + 1, base[apart] + hi[apart])),
+        np.repeat((1.0, -1.0), np.count_nonzero(apart)),
+        minlength=size,
+    ).reshape(-1, width)
+    band = band.reshape(-1, width) + np.cumsum(steps, axis=1)
+    np.minimum(band[:, :cols], 1.0, out=coverage[top:bottom])
+    return coverage
+
+
+def polygon_segments(vertices):
+    """Return the closed polygon's edges as an (E, 2, 2) array of (start, end) pairs."""
+    v = np.asarray(vertices, dtype=float)
+    return np.stack((v, np.roll(v, -1, axis=0)), axis=1)
+
+
+def intersect_rays_segments(origins, directions, segments):
+    """
+    Intersect K rays with E segments in one broadcast pass.
+
+    Solves ``origin + t * direction == start + u * (end - start)`` for every
+    ray/segment pair and keeps the nearest hit with ``t >= 0`` and
+    ``0 <= u <= 1``. Parallel (including collinear) pairs never count as hits.
+
+    :param origins: (K, 2) ray origins
+    :param directions: (K, 2) or (2,) ray directions
+    :param segments: (E, 2, 2) segment start and end points
+    :return: (t, points, hit, edge) with shapes (K,), (K, 2), (K,), (K,);
+        misses have ``t == inf``, ``points == nan`` and ``edge == -1``
+    """
+    origins = np.asarray(origins, dtype=float).reshape(-1, 2)
+    directions = np.broadcast_to(np.asarray(directions, dtype=float), origins.shape)
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+
+    starts = segments[None, :, 0, :]  # (1, E, 2)
+    spans = segments[None, :, 1, :] - starts
+    d = directions[:, None, :]  # (K, 1, 2)
+    offset = starts - origins[:, None, :]  # (K, E, 2)
+
+    denom = d[..., 0] * spans[..., 1] - d[..., 1] * spans[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = (offset[..., 0] * spans[..., 1] - offset[..., 1] * spans[..., 0]) / denom
+        u = (offset[..., 0] * d[..., 1] - offset[..., 1] * d[..., 0]) / denom
+    valid = (denom != 0) & (t >= 0) & (u >= 0) & (u <= 1)
+    t = np.where(valid, t, np.inf)
+
+    edge = np.argmin(t, axis=1)
+    t_near = t[np.arange(len(t)), edge]
+    hit = np.isfinite(t_near)
+    points = origins + directions * np.where(hit, t_near, np.nan)[:, None]
+    return t_near, points, hit, np.where(hit, edge, -1)
+
+
+def lit_silhouette(vertices):
+    """
+    Return the chain of a convex polygon that rays travelling in +x hit first.
+
+    The chain runs from the lowest to the highest vertex along the left-facing
+    side, ordered by increasing y, as a (k, 2) array.
+    """
+    v = np.asarray(vertices, dtype=float)
+    n = len(v)
+    bottom = np.lexsort((v[:, 0], v[:, 1]))[0]  # Lowest, then leftmost
+    top = np.lexsort((v[:, 0], -v[:, 1]))[0]  # Highest, then leftmost
+
+    # Walking a counter-clockwise polygon up from its lowest vertex follows the
+    # right-hand side, so the left-facing chain is the one walked backwards
+    if signed_area(v) > 0:
+        return v[(bottom - np.arange((bottom - top) % n + 1)) % n]
+    return v[(bottom + np.arange((top - bottom) % n + 1)) % n]
+
+
+def shadow_strip(silhouette, wall_x):
+    """
+    Return the exact shadow between a lit silhouette and the wall at ``wall_x``.
+
+    The result interleaves each silhouette vertex with its projection onto the
+    wall, so it can be drawn directly as a GL_TRIANGLE_STRIP.
+    """
+    silhouette = np.asarray(silhouette, dtype=float)
+    strip = np.empty((2 * len(silhouette), 2))
+    strip[0::2] = silhouette
+    strip[1::2, 0] = wall_x
+    strip[1::2, 1] = silhouette[:, 1]
+    return strip
+
+
+def shadow_area(silhouette, wall_x):
+    """Return the area between a lit silhouette and the wall at ``wall_x``."""
+    silhouette = np.asarray(silhouette, dtype=float)
+    widths = wall_x - silhouette[:, 0]
+    return float(np.sum(0.5 * (widths[1:] + widths[:-1]) * np.diff(silhouette[:, 1])))
@@ -0,0 +1,280 @@
+"""OpenGL buffer-object and texture helpers used by the retained rendering paths."""
+
+import ctypes
+
+import numpy as np
+
+from lazy import LazyModule
+
+gl = LazyModule("OpenGL.GL")  # Imported on first use, so creating helpers needs no GL
+
+
+class VertexStream:
+    """
+    Stream per-frame 2D geometry through one reused vertex buffer object.
+
+    Each upload orphans the buffer storage with ``glBufferData(..., None, ...)``
+    before writing, so the driver can hand back fresh memory instead of
+    stalling on a buffer the GPU is still reading from the previous draw.
+    Index buffers for ``draw_elements`` are streamed the same way.
+    """
+
+    def __init__(self, usage=None):
+        self.usage = usage  # Defaults to GL_STREAM_DRAW
+        self.vbo = None  # Created lazily once a GL context exists
+        self.ibo = None
+        self.capacity = 0  # Bytes allocated on the GPU for vertices
+        self.index_capacity = 0
+
+    def _stream(self, target, buffer, data, capacity):
+        """Orphan ``buffer`` and write ``data`` into it; return the possibly grown capacity."""
+        gl.glBindBuffer(target, buffer)
+        # Grow in powers of two so the orphaned size rarely changes
+        if data.nbytes > capacity:
+            capacity = max(1 << (data.nbytes - 1).bit_length(), 1024)
+        gl.glBufferData(target, capacity, None, gl.GL_STREAM_DRAW if self.usage is None else self.usage)
+        if data.nbytes:
+            gl.glBufferSubData(target, 0, data.nbytes, data)
+        return capacity
+
+    def upload(self, vertices):
+        """Orphan the buffer and upload an (n, 2) array as float32; return the vertex count."""
+        data = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 2)
+        if self.vbo is None:
+            self.vbo = gl.glGenBuffers(1)
+        self.capacity = self._stream(gl.GL_ARRAY_BUFFER, self.vbo, data, self.capacity)
+        return len(data)
+
+    def patch(self, vertices, first):
+        """
+        Rewrite an (n, 2) array from vertex ``first`` on, keeping the vertices before it; return n.
+
+        The storage is not orphaned, so the GPU keeps the unchanged prefix.
+        Without a buffer, or when the array outgrows it, everything is
+        uploaded into a larger one instead.
+        """
+        data = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 2)
+        if self.vbo is None or data.nbytes > self.capacity:
+            return self.upload(data)
+        changed = data[first:]
+        if len(changed):
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, first * data.itemsize * 2, changed.nbytes, changed)
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        return len(data)
+
+    def draw(self, vertices, mode, color=None):
+        """Upload the vertices and draw them with a single glDrawArrays call."""
+        self.draw_uploaded(self.upload(vertices), mode, color)
+
+    def draw_uploaded(self, count, mode, color=None):
+        """Draw the first ``count`` vertices of the last upload again, without uploading."""
+        if count == 0 or self.vbo is None:
+            gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+            return
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        if color is not None:
+            gl.glColor3f(*color)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, ctypes.c_void_p(0))
+        gl.glDrawArrays(mode, 0, count)
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def draw_elements(self, indices, mode, color=None):
+        """
+        Draw the last uploaded vertices through an index buffer with one glDrawElements call.
+
+        Call ``upload`` once per frame and then this once per index set, so
+        several index sets share one vertex upload.
+        """
+        data = np.ascontiguousarray(indices, dtype=np.uint32).ravel()
+        if len(data) == 0 or self.vbo is None:
+            return
+        if self.ibo is None:
+            self.ibo = gl.glGenBuffers(1)
+        self.index_capacity = self._stream(gl.GL_ELEMENT_ARRAY_BUFFER, self.ibo, data, self.index_capacity)
+        if color is not None:
+            gl.glColor3f(*color)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, ctypes.c_void_p(0))
+        gl.glDrawElements(mode, len(data), gl.GL_UNSIGNED_INT, ctypes.c_void_p(0))
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glBindBuffer(gl.GL_ELEMENT_ARRAY_BUFFER, 0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        """Release the GPU buffers."""
+        for buffer in (self.vbo, self.ibo):
+            if buffer is not None:
+                gl.glDeleteBuffers(1, [buffer])
+        self.vbo = self.ibo = None
+        self.capacity = self.index_capacity = 0
+
+
+class MaskTexture:
+    """
+    Single-channel 8-bit texture re-uploaded every frame and drawn on one quad.
+
+    Storage is allocated with ``glTexImage2D`` only when the mask size
+    changes; later frames overwrite it with ``glTexSubImage2D``.
+    """
+
+    def __init__(self, filtering=None):
+        self.filtering = filtering  # Defaults to GL_LINEAR
+        self.texture = None  # Created lazily once a GL context exists
+        self.shape = None
+
+    def upload(self, mask):
+        """Upload an (h, w) uint8 array; row 0 is the bottom of the quad."""
+        data = np.ascontiguousarray(mask, dtype=np.uint8)
+        height, width = data.shape
+        if self.texture is None:
+            self.texture = gl.glGenTextures(1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)  # Rows are not padded to 4 bytes
+        if data.shape != self.shape:
+            filtering = gl.GL_LINEAR if self.filtering is None else self.filtering
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, filtering)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, filtering)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+            gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+            gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_LUMINANCE, width, height, 0, gl.GL_LUMINANCE, gl.GL_UNSIGNED_BYTE, data)
+            self.shape = data.shape
+        else:
+            gl.glTexSubImage2D(gl.GL_TEXTURE_2D, 0, 0, 0, width, height, gl.GL_LUMINANCE, gl.GL_UNSIGNED_BYTE, data)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+    def draw(self, bounds, mask=None):
+        """Draw the texture over (min_x, min_y, max_x, max_y), uploading ``mask`` first if given."""
+        if mask is not None:
+            self.upload(mask)
+        if self.texture is None:
+            return
+        x0, y0, x1, y1 = bounds
+        gl.glEnable(gl.GL_TEXTURE_2D)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glTexEnvi(gl.GL_TEXTURE_ENV, gl.GL_TEXTURE_ENV_MODE, gl.GL_REPLACE)
+        gl.glBegin(gl.GL_QUADS)
+        gl.glTexCoord2f(0, 0)
+        gl.glVertex2f(x0, y0)
+        gl.glTexCoord2f(1, 0)
+        gl.glVertex2f(x1, y0)
+        gl.glTexCoord2f(1, 1)
+        gl.glVertex2f(x1, y1)
+        gl.glTexCoord2f(0, 1)
+        gl.glVertex2f(x0, y1)
+        gl.glEnd()
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glDisable(gl.GL_TEXTURE_2D)
+
+    def delete(self):
+        """Release the GPU texture."""
+        if self.texture is not None:
+            gl.glDeleteTextures(1, [self.texture])
+        self.texture = None
+        self.shape = None
+
+
+class HistoryBuffer:
+    """
+    GPU copy of a RingBuffer history that only uploads what was added.
+
+    Every stored item becomes ``per_item`` vertices through ``build``. ``sync``
+    writes the vertices of items stored since the last sync after the ones
+    already on the GPU with ``glBufferSubData``, so the per-frame upload
+    depends on how much was added, not on the history length. Items the ring
+    drops from the front are skipped by moving the draw offset. When the
+    storage runs out it is reallocated at twice the live size and the live
+    history re-uploaded, which also compacts away dropped items, so every
+    vertex is uploaded a constant number of times on average. Rings that
+    move items (decimation) are re-uploaded whenever that happens.
+
+    :param per_item: vertices generated for every stored item
+    :param build: ``build(items, previous)`` returning the vertices of
+        ``items`` as (len(items) * per_item, 2), where ``previous`` is the
+        stored item before them or None; defaults to the items' own points
+    :param chained: an item's vertices join it to the item before it, so the
+        oldest live item's vertices are not drawn
+    """
+
+    def __init__(self, per_item, build=None, chained=False, usage=None):
+        self.per_item = per_item
+        self.build = build
+        self.chained = chained
+        self.usage = usage  # Defaults to GL_DYNAMIC_DRAW
+        self.vbo = None  # Created lazily once a GL context exists
+        self.capacity = 0  # Vertices allocated on the GPU
+        self.end = 0  # Vertices written since the last re-upload
+        self.base = 0  # Ring ``written`` index of the item at the start of the buffer
+        self.written = 0  # Ring ``written`` count at the last sync
+        self.generation = None
+        self.first = 0  # Live vertices to draw
+        self.count = 0
+        self.uploaded = 0  # Vertices uploaded over the whole run
+
+    def _vertices(self, items, previous):
+        vertices = items if self.build is None else self.build(items, previous)
+        return np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 2)
+
+    def _upload_all(self, items, written):
+        data = self._vertices(items, None)
+        # Leave as much room again, so the next re-upload is at least as many vertices away
+        if 2 * len(data) > self.capacity:
+            self.capacity = max(1 << (2 * len(data) - 1).bit_length(), 1024)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, self.capacity * 8, None,
+                        gl.GL_DYNAMIC_DRAW if self.usage is None else self.usage)
+        if len(data):
+            gl.glBufferSubData(gl.GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        self.end = len(data)
+        self.base = written - len(items)
+        self.uploaded += len(data)
+
+    def sync(self, ring):
+        """Bring the GPU copy up to date with ``ring``."""
+        if self.vbo is None:
+            self.vbo = gl.glGenBuffers(1)
+        items = ring.view()
+        new = ring.written - self.written
+        moved = self.generation is None or new < 0 or (ring.policy != "oldest" and ring.generation != self.generation)
+        if moved or new >= len(items) > 0:
+            self._upload_all(items, ring.written)
+        elif new:
+            data = self._vertices(items[-new:], items[-new - 1])
+            if self.end + len(data) > self.capacity:
+                self._upload_all(items, ring.written)
+            else:
+                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+                gl.glBufferSubData(gl.GL_ARRAY_BUFFER, self.end * 8, data.nbytes, data)
+                gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+                self.end += len(data)
+                self.uploaded += len(data)
+        self.written, self.generation = ring.written, ring.generation
+
+        skipped = 1 if self.chained else 0
+        self.first = (ring.written - len(items) - self.base + skipped) * self.per_item
+        self.count = max(len(items) - skipped, 0) * self.per_item
+
+    def draw(self, mode, color=None):
+        """Draw the synced history with a single glDrawArrays call."""
+        if self.vbo is None or self.count == 0:
+            return
+        if color is not None:
+            gl.glColor3f(*color)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        gl.glEnableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glVertexPointer(2, gl.GL_FLOAT, 0, ctypes.c_void_p(0))
+        gl.glDrawArrays(mode, self.first, self.count)
+        gl.glDisableClientState(gl.GL_VERTEX_ARRAY)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def delete(self):
+        """Release the GPU buffer; the next sync re-uploads the whole history."""
+        if self.vbo is not None:
+            gl.glDeleteBuffers(1, [self.vbo])
+        self.vbo = None
+        self.capacity = self.end = self.written = 0
+        self.generation = None
@@ -0,0 +1,125 @@
+"""Bounded, array-backed history storage for long-running tracers."""
+
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity store of equally shaped items backed by one NumPy array.
+
+    Two eviction policies are available once the buffer is full:
+
+    * ``"oldest"`` drops the oldest item for every new one. Items are written
+      twice into a buffer of twice the capacity so the live items are always
+      one contiguous slice, which keeps ``view()`` copy-free.
+    * ``"decimate"`` halves the stored history by keeping every other item and
+      from then on only keeps every ``stride``-th appended item, so the
+      history stays evenly spread over the whole run.
+
+    ``generation`` increases whenever stored items are dropped or moved, so
+    consumers caching derived data (GPU buffers, statistics) know to rebuild.
+    ``written`` counts items ever stored, so the newest ``written - n`` ones
+    are what was added since a consumer last saw ``n``.
+    """
+
+    POLICIES = ("oldest", "decimate")
+
+    def __init__(self, capacity, item_shape=(), dtype=float, policy="oldest"):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown eviction policy {policy!r}, expected one of {self.POLICIES}")
+        if policy == "decimate" and capacity < 2:
+            raise ValueError("the decimate policy needs a capacity of at least 2")
+        self.capacity = capacity
+        self.item_shape = tuple(item_shape)
+        self.policy = policy
+        slots = 2 * capacity if policy == "oldest" else capacity
+        self._data = np.empty((slots,) + self.item_shape, dtype=dtype)
+        self.clear()
+
+    def clear(self):
+        """Forget all stored items."""
+        self.start = 0
+        self.count = 0
+        self.appended = 0  # Items offered over the whole run
+        self.written = 0  # Items stored over the whole run
+        self.stride = 1  # Appended items represented by each stored one
+        self.generation = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.view())
+
+    def __getitem__(self, index):
+        return self.view()[index]
+
+    def view(self):
+        """Return the stored items, oldest first, as a contiguous array view."""
+        return self._data[self.start:self.start + self.count]
+
+    def append(self, item):
+        """Store one item in O(1)."""
+        self.extend(np.asarray(item, dtype=self._data.dtype)[None])
+
+    def extend(self, items):
+        """Store a batch of items with array writes only."""
+        items = np.asarray(items, dtype=self._data.dtype).reshape((-1,) + self.item_shape)
+        if self.policy == "oldest":
+            self._extend_oldest(items)
+        else:
+            self._extend_decimate(items)
+
+    def _extend_oldest(self, items):
+        n = len(items)
+        self.appended += n
+        if n == 0:
+            return
+        if n >= self.capacity:
+            # The batch alone fills the buffer
+            self._data[:self.capacity] = items[-self.capacity:]
+            self._data[self.capacity:] = items[-self.capacity:]
+            self.start = 0
+            self.count = self.capacity
+            self.written += self.capacity
+            self.generation += 1
+            return
+
+        slots = (self.start + self.count + np.arange(n)) % self.capacity
+        self._data[slots] = items
+        self._data[slots + self.capacity] = items
+        self.written += n
+        overflow = self.count + n - self.capacity
+        if overflow > 0:
+            self.start = (self.start + overflow) % self.capacity
+            self.count = self.capacity
+            self.generation += 1
+        else:
+            self.count += n
+
+    def _extend_decimate(self, items):
+        while len(items):
+            if self.count == self.capacity:
+                self._decimate()
+            keep = np.flatnonzero((self.appended + np.arange(len(items))) % self.stride == 0)
+            free = self.capacity - self.count
+            if len(keep) > free:
+                # Fill up to capacity, then decimate before taking the rest
+                keep = keep[:free]
+                consumed = keep[-1] + 1
+            else:
+                consumed = len(items)
+            self._data[self.count:self.count + len(keep)] = items[keep]
+            self.count += len(keep)
+            self.written += len(keep)
+            self.appended += consumed
+            items = items[consumed:]
+
+    def _decimate(self):
+        kept = self._data[0:self.count:2]
+        self._data[:len(kept)] = kept
+        self.count = len(kept)
+        self.stride *= 2
+        self.generation += 1
@@ -0,0 +1,87 @@
+"""
+One entry point for the simulations, importing rendering backends only when a mode needs them.
+
+    python -m launcher shadow [options]   # Simulation.py, rotating square shadow
+    python -m launcher rays [options]     # 2drender.py, Monte Carlo ray tracer
+    python -m launcher strips [options]   # "2drender copy.py", strip-shadow tracer
+
+Everything after the mode is passed to that program, so
+``python -m launcher rays --headless --steps 100`` behaves like
+``python 2drender.py --headless --steps 100``. pygame, PyOpenGL and shapely
+are loaded lazily on first use, so headless and batch runs never pay for
+them. ``--timings`` reports where startup time went, and ``--budget MS``
+fails the run if startup took longer than that.
+"""
+
+import time
+
+_STARTED = time.perf_counter()  # Before any other import, so they are counted
+
+import argparse
+import importlib
+import sys
+
+from lazy import LOAD_TIMES
+
+# Mode -> (module, description)
+MODES = {
+    "shadow": ("Simulation", "rotating square shadow from classified random samples"),
+    "rays": ("2drender", "Monte Carlo ray tracer with per-ray shadow triangles"),
+    "strips": ("2drender copy", "Monte Carlo ray tracer with chained shadow strips"),
+}
+BACKENDS = ("pygame", "OpenGL.GL", "shapely")
+
+
+def loaded_backends():
+    """Return the heavy backends that have been imported so far."""
+    return [name for name in BACKENDS if name in sys.modules]
+
+
+def format_timings(timings):
+    lines = [f"{name:<24}{seconds * 1e3:9.1f} ms" for name, seconds in timings.items()]
+    backends = loaded_backends()
+    lines.append(f"{'backends loaded':<24}{', '.join(backends) if backends else 'none'}")
+    for name, seconds in LOAD_TIMES.items():
+        lines.append(f"{'  lazy ' + name:<24}{seconds * 1e3:9.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m launcher",
+        description="Run one of the shadow simulations.",
+        epilog="\n".join(f"{mode}: {description}" for mode, (_, description) in MODES.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--timings", action="store_true", help="report import and startup times")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="fail with exit status 1 if startup took longer than this many milliseconds")
+    parser.add_argument("mode", choices=MODES, help="program to run")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="options passed on to the program")
+    args = parser.parse_args(argv)
+
+    timings = {"launcher": time.perf_counter() - _STARTED}
+    start = time.perf_counter()
+    module = importlib.import_module(MODES[args.mode][0])
+    timings[f"import {args.mode}"] = time.perf_counter() - start
+    startup = time.perf_counter() - _STARTED
+    timings["startup"] = startup
+
+    over_budget = args.budget is not None and startup * 1e3 > args.budget
+    if args.timings or over_budget:
+        print(format_timings(timings), file=sys.stderr)
+
+    start = time.perf_counter()
+    module.main(args.args)
+    if args.timings:
+        timings = {"run": time.perf_counter() - start}
+        print(format_timings(timings), file=sys.stderr)
+
+    if over_budget:
+        print(f"startup took {startup * 1e3:.1f} ms, over the {args.budget:.1f} ms budget", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""Deferred imports for the heavy rendering backends."""
+
+import importlib
+import time
+
+LOAD_TIMES = {}  # Module name -> seconds spent importing it on first use
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    ``gl = LazyModule("OpenGL.GL")`` costs nothing until ``gl.glBegin`` is
+    looked up, so headless runs never import the backend. Every attribute is
+    cached on the proxy after its first lookup, so later accesses in hot loops
+    are ordinary instance-dict hits.
+    """
+
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            start = time.perf_counter()
+            module = importlib.import_module(self._name)
+            LOAD_TIMES.setdefault(self._name, time.perf_counter() - start)
+            self.__dict__["_module"] = module
+        return module
+
+    @property
+    def loaded(self):
+        return self.__dict__["_module"] is not None
+
+    def __getattr__(self, attr):
+        value = getattr(self._load(), attr)
+        self.__dict__[attr] = value
+        return value
+
+    def __setattr__(self, attr, value):
+        raise AttributeError(f"cannot set {attr!r} on lazy module {self._name!r}")
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
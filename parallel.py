@@ -0,0 +1,163 @@
+"""
+Multi-process Monte Carlo ray sampling with results in shared memory.
+
+Workers generate and intersect their own shard of rays with an independent
+RNG stream, following the tracer's RaySampler strategy, and write the results straight into ``multiprocessing.shared_memory``
+arrays, so only a few small arguments are pickled per shard, never rays.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from geometry import intersect_rays_segments
+from sampling import unit_samples
+
+# Per-ray fields and their trailing shapes, laid out back to back in one block
+FIELDS = (
+    ("origin_y", np.float64, ()),
+    ("square_hits", np.float64, (2,)),
+    ("wall_hits", np.float64, (2,)),
+    ("hit", np.bool_, ()),
+)
+
+
+def _layout(count):
+    """Return ({field: (offset, dtype, shape)}, total bytes) for ``count`` rays."""
+    layout, offset = {}, 0
+    for name, dtype, shape in FIELDS:
+        layout[name] = (offset, dtype, (count,) + shape)
+        offset += count * int(np.prod(shape, dtype=int)) * np.dtype(dtype).itemsize
+        offset += -offset % 8  # Keep every field 8-byte aligned
+    return layout, offset
+
+
+def _views(buffer, count):
+    """Map the shared block onto one NumPy array per field without copying."""
+    layout, _ = _layout(count)
+    return {
+        name: np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+        for name, (offset, dtype, shape) in layout.items()
+    }
+
+
+def _cast_shard(name, count, start, stop, seed, segments, wall, y_range, x_range, chunk, strategy, index, shift):
+    """
+    Worker: cast rays [start, stop) of a batch of ``count`` and write them into the shared block ``name``.
+
+    ``strategy``, ``index`` and ``shift`` are those of the tracer's RaySampler, see sampling.unit_samples.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        arrays = _views(block.buf, count)
+        rng = np.random.default_rng(seed)
+        direction = np.array([x_range[1] - x_range[0], 0.0])
+        for first in range(start, stop, chunk):
+            last = min(first + chunk, stop)
+            unit = unit_samples(strategy, first, last, count, rng, index, shift)
+            origin_y = y_range[0] + unit * (y_range[1] - y_range[0])
+            origins = np.column_stack((np.full(len(origin_y), float(x_range[0])), origin_y))
+            _, square_hits, square_mask, _ = intersect_rays_segments(origins, direction, segments)
+            _, wall_hits, wall_mask, _ = intersect_rays_segments(origins, direction, wall)
+            arrays["origin_y"][first:last] = origin_y
+            arrays["square_hits"][first:last] = square_hits
+            arrays["wall_hits"][first:last] = wall_hits
+            arrays["hit"][first:last] = square_mask & wall_mask
+        del arrays  # Release the exported buffer before closing
+    finally:
+        block.close()
+    return stop - start
+
+
+class ParallelRaySampler:
+    """
+    Spread parallel-ray sampling for a MonteCarloRayTracer over a process pool.
+
+    Every call to ``sample`` spawns one child ``SeedSequence`` per shard, so
+    shards draw independent streams and a fixed seed reproduces the whole
+    run for a fixed worker count. Origins follow the tracer's RaySampler:
+    its strategy, its position in the low-discrepancy sequence and, with
+    importance sampling, the square's y-extent.
+
+    :param ray_tracer: MonteCarloRayTracer whose square, wall and stores are used
+    :param wall: (1, 2, 2) backboard segment
+    :param workers: process count, defaults to os.cpu_count()
+    :param seed: root seed for all worker streams
+    :param chunk: rays a worker intersects at once, bounding its peak memory
+    :param y_range: fixed (low, high) origin interval, overriding the one
+        the tracer's sampler would choose
+    """
+
+    def __init__(self, ray_tracer, wall, workers=None, seed=None, chunk=1 << 16,
+                 y_range=None, x_range=(-10, 10)):
+        self.ray_tracer = ray_tracer
+        self.wall = np.asarray(wall, dtype=float)
+        self.workers = workers or os.cpu_count() or 1
+        self.seed_sequence = np.random.SeedSequence(seed)
+        self.chunk = chunk
+        self.y_range = y_range
+        self.x_range = x_range
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """Shut the worker pool down."""
+        self.pool.shutdown()
+
+    def sample(self, count, store=True):
+        """
+        Cast ``count`` rays across the pool.
+
+        :param store: merge the results into the tracer's stores and totals
+        :return: (rays, square_hits, wall_hits, hit_mask) like cast_rays()
+        """
+        sampler = self.ray_tracer.sampler
+        if self.y_range is not None:
+            y_range = self.y_range
+        else:
+            _, ymin, _, ymax = self.ray_tracer.square.bbox
+            y_range = sampler.interval((ymin, ymax))
+        index = sampler.index
+        sampler.index += count
+        sampler.width = y_range[1] - y_range[0]
+
+        _, size = _layout(count)
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        try:
+            bounds = np.linspace(0, count, self.workers + 1).astype(int)
+            seeds = self.seed_sequence.spawn(self.workers)
+            segments = np.asarray(self.ray_tracer.square.segments, dtype=float)
+            futures = [
+                self.pool.submit(
+                    _cast_shard, block.name, count, start, stop, seed,
+                    segments, self.wall, y_range, self.x_range, self.chunk,
+                    sampler.strategy, index, sampler.shift,
+                )
+                for start, stop, seed in zip(bounds[:-1], bounds[1:], seeds)
+                if stop > start
+            ]
+            for future in futures:
+                future.result()
+
+            # One copy out of shared memory per field, then the block can go
+            arrays = {name: array.copy() for name, array in _views(block.buf, count).items()}
+        finally:
+            block.close()
+            block.unlink()
+
+        rays = np.empty((count, 2, 2))
+        rays[:, 0, 0] = self.x_range[0]
+        rays[:, 1, 0] = self.x_range[1]
+        rays[:, :, 1] = arrays["origin_y"][:, None]
+        result = rays, arrays["square_hits"], arrays["wall_hits"], arrays["hit"]
+        if store:
+            self.ray_tracer.store_rays(*result, width=y_range[1] - y_range[0])
+        return result
@@ -0,0 +1,81 @@
+"""Double-buffered producer thread for overlapping frame simulation with rendering."""
+
+import queue
+import threading
+
+
+class FramePipeline:
+    """
+    Prepare frames on a worker thread while the caller renders earlier ones.
+
+    The worker takes a free buffer, fills it with ``prepare(buffer)`` and
+    hands it over; the caller ``acquire``s it, draws it and ``release``s it
+    back. Only ``len(buffers)`` buffers exist, so the worker can run at most
+    that many frames ahead and then blocks: with two buffers it prepares
+    frame N+1 while frame N is drawn. NumPy releases the GIL inside its
+    vectorized kernels, and pygame releases it while flipping and sleeping,
+    so the two threads overlap.
+
+    If ``prepare`` raises, the worker stops, ``error`` holds the exception
+    and ``acquire`` returns None, so the caller can fall back to preparing
+    frames itself.
+
+    :param prepare: callable filling one buffer in place
+    :param buffers: preallocated frame buffers, two for double buffering
+    :param profiler: optional FrameProfiler timing ``prepare`` as "prepare"
+    """
+
+    def __init__(self, prepare, buffers, profiler=None):
+        self.prepare = prepare
+        self.profiler = profiler
+        self.free = queue.Queue()
+        self.ready = queue.Queue()
+        for buffer in buffers:
+            self.free.put(buffer)
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-pipeline", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                buffer = self.free.get(timeout=0.05)
+            except queue.Empty:
+                continue
+            if self._stop.is_set():
+                break
+            try:
+                if self.profiler is not None:
+                    with self.profiler.phase("prepare"):
+                        self.prepare(buffer)
+                else:
+                    self.prepare(buffer)
+            except Exception as exc:
+                self.error = exc
+                self.ready.put(None)
+                return
+            self.ready.put(buffer)
+
+    def acquire(self, timeout=None):
+        """Return the next prepared buffer, or None once the worker has failed."""
+        buffer = self.ready.get(timeout=timeout)
+        if buffer is None:
+            self.ready.put(None)  # Keep failing for later calls
+        return buffer
+
+    def release(self, buffer):
+        """Hand a drawn buffer back to the worker."""
+        self.free.put(buffer)
+
+    def close(self):
+        """Stop the worker and wait for it, discarding frames it prepared ahead."""
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
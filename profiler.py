@@ -0,0 +1,195 @@
+"""Low-overhead per-phase frame timing with rolling percentiles and Chrome trace export."""
+
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Overlay colors per phase, cycled in the order phases are first seen
+PHASE_COLORS = [
+    (0.9, 0.3, 0.3),
+    (0.3, 0.9, 0.3),
+    (0.3, 0.5, 1.0),
+    (1.0, 0.8, 0.2),
+    (0.8, 0.3, 0.9),
+    (0.2, 0.9, 0.9),
+    (1.0, 0.5, 0.1),
+]
+
+
+class _PhaseTimer:
+    """Reusable context manager timing one named phase."""
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NullTimer:
+    """Stand-in used while profiling is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class FrameProfiler:
+    """
+    Time named phases of every frame.
+
+    Wrap each phase in ``with profiler.phase("name"):`` and call
+    ``end_frame()`` once per frame. The last ``window`` durations of every
+    phase are kept for rolling percentiles, and up to ``trace_limit`` events
+    are kept for Chrome trace export (chrome://tracing or Perfetto). Phases
+    timed on other threads, such as a FramePipeline worker, are exported on
+    their own thread's track. Recording and reading are guarded by a lock,
+    so the overlay can be drawn while the worker records.
+
+    :param window: frames kept for the rolling percentiles
+    :param trace_limit: maximum trace events kept, oldest dropped first
+    :param enabled: when False, phase() is a no-op
+    """
+
+    def __init__(self, window=300, trace_limit=200000, enabled=True):
+        self.window = window
+        self.enabled = enabled
+        self.samples = {}  # Phase name -> deque of durations in ns
+        self.trace = deque(maxlen=trace_limit)  # (name, start_ns, duration_ns, frame, thread id)
+        self.thread_names = {}  # Native thread id -> name, for labelling trace tracks
+        self.frame = 0
+        self._lock = threading.Lock()  # Phases may be recorded from a worker thread
+        self._timers = {}
+        self._origin = time.perf_counter_ns()
+        self._frame_start = self._origin
+
+    def phase(self, name):
+        """Return a context manager timing ``name`` for the current frame."""
+        if not self.enabled:
+            return _NULL_TIMER
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self, name)
+        return timer
+
+    def record(self, name, start_ns, duration_ns):
+        """Store one phase duration; called by the phase timers."""
+        thread = threading.get_native_id()
+        with self._lock:
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(duration_ns)
+            if thread not in self.thread_names:
+                self.thread_names[thread] = threading.current_thread().name
+            self.trace.append((name, start_ns, duration_ns, self.frame, thread))
+
+    def end_frame(self):
+        """Close the current frame, recording its total duration as the "frame" phase."""
+        now = time.perf_counter_ns()
+        if self.enabled:
+            self.record("frame", self._frame_start, now - self._frame_start)
+        self._frame_start = now
+        self.frame += 1
+
+    def percentiles(self, quantiles=(50, 95, 99)):
+        """Return {phase: array of the requested percentiles in milliseconds}."""
+        with self._lock:
+            snapshot = {
+                name: np.fromiter(samples, dtype=np.int64, count=len(samples))
+                for name, samples in self.samples.items()
+                if samples
+            }
+        return {name: np.percentile(durations, quantiles) / 1e6 for name, durations in snapshot.items()}
+
+    def summary(self):
+        """Return a p50/p95/p99 table of every phase as text."""
+        lines = [f"{'phase':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"]
+        for name, (p50, p95, p99) in self.percentiles().items():
+            lines.append(f"{name:<16}{p50:>10.3f}{p95:>10.3f}{p99:>10.3f}")
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """Return the recorded events in Chrome trace-event format."""
+        with self._lock:
+            trace = list(self.trace)
+            thread_names = dict(self.thread_names)
+        events = [
+            {
+                "name": name,
+                "cat": "frame" if name == "frame" else "phase",
+                "ph": "X",
+                "ts": (start - self._origin) / 1e3,
+                "dur": duration / 1e3,
+                "pid": 0,
+                "tid": thread,
+                "args": {"frame": frame},
+            }
+            for name, start, duration, frame, thread in trace
+        ]
+        # Label every thread's track with its name
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": 0, "tid": thread, "args": {"name": name}}
+            for thread, name in thread_names.items()
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump_chrome_trace(self, path):
+        """Write the recorded events to ``path`` as Chrome trace JSON."""
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def draw_overlay(self, budget_ms=1000 / 60, origin=(-9.5, 9.5), width=8.0, row_height=0.5):
+        """
+        Draw one bar per phase in the current GL context.
+
+        Bars are scaled so ``width`` world units equal ``budget_ms``; the
+        solid part is p50, the lighter extensions reach p95 and p99.
+        """
+        from OpenGL.GL import GL_BLEND, GL_LINES, GL_ONE_MINUS_SRC_ALPHA, GL_QUADS, GL_SRC_ALPHA
+        from OpenGL.GL import glBegin, glBlendFunc, glColor4f, glDisable, glEnable, glEnd, glVertex2f
+
+        x0, y = origin
+        scale = width / budget_ms
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glBegin(GL_QUADS)
+        percentiles = self.percentiles()
+        for i, (name, values) in enumerate(percentiles.items()):
+            r, g, b = PHASE_COLORS[i % len(PHASE_COLORS)]
+            top, bottom = y - i * row_height, y - (i + 0.8) * row_height
+            for value, alpha in zip(values[::-1], (0.25, 0.5, 0.9)):  # p99, p95, p50
+                x1 = x0 + min(value * scale, 2 * width)
+                glColor4f(r, g, b, alpha)
+                glVertex2f(x0, bottom)
+                glVertex2f(x1, bottom)
+                glVertex2f(x1, top)
+                glVertex2f(x0, top)
+        glEnd()
+
+        # Frame budget marker
+        glColor4f(1, 1, 1, 0.8)
+        glBegin(GL_LINES)
+        glVertex2f(x0 + width, y)
+        glVertex2f(x0 + width, y - len(percentiles) * row_height)
+        glEnd()
+        glDisable(GL_BLEND)
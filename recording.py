@@ -0,0 +1,216 @@
+"""
+Append-only per-frame recordings that can be memory-mapped for replay.
+
+An archive is a directory holding, for every recorded field:
+
+* ``<field>.bin``: the raw items of every frame back to back
+* ``<field>.idx``: int64 end offset, in items, of every frame's run
+
+plus ``manifest.json`` with the field dtypes and item shapes, the number of
+complete frames and free-form metadata. Frames are buffered in memory and
+appended a chunk at a time. Each flush appends data first, then the index,
+then rewrites the manifest, so an interrupted recording stays readable up
+to its last complete chunk.
+
+FrameArchive maps the data files with ``np.memmap``, so reading a frame
+range only touches the pages it needs.
+"""
+
+import json
+import os
+
+import numpy as np
+
+MANIFEST = "manifest.json"
+VERSION = 1
+
+
+class FrameRecorder:
+    """
+    Stream per-frame arrays into an archive directory.
+
+    Every call to ``record`` is one frame. Each keyword is a field: an
+    array of any number of items of a fixed item shape, or a scalar. A
+    field missing from a frame is stored as zero items for that frame.
+
+    :param path: archive directory, created if needed; an existing
+        recording there is replaced, any other non-empty directory is refused
+    :param chunk_frames: frames buffered before they are appended to disk
+    :param metadata: JSON-serializable dict stored in the manifest, e.g.
+        the scene parameters needed to replay
+    """
+
+    def __init__(self, path, chunk_frames=64, metadata=None):
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.metadata = metadata or {}
+        self.fields = {}  # Name -> {"dtype", "item_shape", "scalar"}
+        self.frames = 0  # Frames recorded, flushed or not
+        self.flushed = 0  # Frames on disk
+        self._pending = []  # Buffered frames, one dict each
+        self._ends = {}  # Name -> items written so far
+        os.makedirs(path, exist_ok=True)
+        self._clear_archive()
+        self._write_manifest()
+
+    def _clear_archive(self):
+        """Delete the files of an archive already at ``path``, and nothing else."""
+        manifest = os.path.join(self.path, MANIFEST)
+        if not os.path.exists(manifest):
+            if os.listdir(self.path):
+                raise ValueError(f"{self.path} is not empty and holds no recording")
+            return
+        with open(manifest) as f:
+            fields = json.load(f)["fields"]
+        for name in fields:
+            for suffix in (".bin", ".idx"):
+                if os.path.exists(self._file(name, suffix)):
+                    os.remove(self._file(name, suffix))
+        os.remove(manifest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _register(self, name, value):
+        value = np.asarray(value)
+        scalar = value.ndim == 0
+        self.fields[name] = {
+            "dtype": value.dtype.str,
+            "item_shape": [] if scalar else list(value.shape[1:]),
+            "scalar": scalar,
+        }
+        self._ends[name] = 0
+        open(self._file(name, ".bin"), "wb").close()  # Drop leftovers of an interrupted recording
+        # Frames before this field first appeared hold no items
+        with open(self._file(name, ".idx"), "wb") as f:
+            np.zeros(self.flushed, dtype=np.int64).tofile(f)
+
+    def _file(self, name, suffix):
+        return os.path.join(self.path, name + suffix)
+
+    def record(self, **fields):
+        """Record one frame of named arrays or scalars."""
+        for name, value in fields.items():
+            if name not in self.fields:
+                self._register(name, value)
+        self._pending.append(fields)
+        self.frames += 1
+        if len(self._pending) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered frames to disk."""
+        if not self._pending:
+            return
+        for name, spec in self.fields.items():
+            dtype = np.dtype(spec["dtype"])
+            item_shape = tuple(spec["item_shape"])
+            parts, ends = [], []
+            end = self._ends[name]
+            for frame in self._pending:
+                value = frame.get(name)
+                if value is not None:
+                    value = np.asarray(value, dtype=dtype).reshape((-1,) + item_shape)
+                    parts.append(value)
+                    end += len(value)
+                ends.append(end)
+            with open(self._file(name, ".bin"), "ab") as f:
+                for part in parts:
+                    np.ascontiguousarray(part).tofile(f)
+            with open(self._file(name, ".idx"), "ab") as f:
+                np.asarray(ends, dtype=np.int64).tofile(f)
+            self._ends[name] = end
+        self.flushed = self.frames
+        self._pending = []
+        self._write_manifest()
+
+    def _write_manifest(self):
+        manifest = {
+            "version": VERSION,
+            "frames": self.flushed,
+            "fields": self.fields,
+            "metadata": self.metadata,
+        }
+        temporary = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temporary, os.path.join(self.path, MANIFEST))  # Readers never see half a manifest
+
+    def close(self):
+        """Flush what is left; the archive stays valid if this is never called."""
+        self.flush()
+
+
+class FrameArchive:
+    """
+    Read-only, memory-mapped view of an archive written by FrameRecorder.
+
+    ``archive[i]`` returns frame ``i`` as {field: array}. Arrays are views into
+    the mapped files, and scalar fields come back as NumPy scalars.
+    ``field(name, start, stop)`` returns one field over a frame range as a
+    single array plus per-frame offsets, for vectorized analysis.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest["version"] != VERSION:
+            raise ValueError(f"unsupported archive version {manifest['version']}")
+        self.frames = manifest["frames"]
+        self.metadata = manifest["metadata"]
+        self.fields = manifest["fields"]
+        self._offsets = {}
+        self._data = {}
+        for name, spec in self.fields.items():
+            ends = np.fromfile(os.path.join(path, name + ".idx"), dtype=np.int64, count=self.frames)
+            self._offsets[name] = np.concatenate(([0], ends))
+            dtype = np.dtype(spec["dtype"])
+            item_shape = tuple(spec["item_shape"])
+            items = int(self._offsets[name][-1])
+            if items:
+                self._data[name] = np.memmap(
+                    os.path.join(path, name + ".bin"), dtype=dtype, mode="r", shape=(items,) + item_shape
+                )
+            else:
+                self._data[name] = np.empty((0,) + item_shape, dtype=dtype)
+
+    def __len__(self):
+        return self.frames
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.frames
+        if not 0 <= index < self.frames:
+            raise IndexError(f"frame {index} out of range for {self.frames} frames")
+        frame = {}
+        for name, spec in self.fields.items():
+            first, last = self._offsets[name][index:index + 2]
+            value = self._data[name][first:last]
+            if spec["scalar"]:
+                if len(value):
+                    frame[name] = value[0]
+            else:
+                frame[name] = value
+        return frame
+
+    def frame_range(self, start=0, stop=None, step=1):
+        """Iterate over frames [start, stop) as dicts, reading only those frames."""
+        for index in range(*slice(start, stop, step).indices(self.frames)):
+            yield self[index]
+
+    def field(self, name, start=0, stop=None):
+        """
+        Return one field over frames [start, stop).
+
+        :return: (items, offsets), where items holds every item of those
+            frames back to back and frame ``start + i`` owns
+            ``items[offsets[i]:offsets[i + 1]]``
+        """
+        start, stop, _ = slice(start, stop).indices(self.frames)
+        offsets = self._offsets[name][start:stop + 1]
+        return self._data[name][offsets[0]:offsets[-1]], offsets - offsets[0]
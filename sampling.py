@@ -0,0 +1,171 @@
+"""Ray origin sampling strategies and convergence tracking for the Monte Carlo tracers."""
+
+import numpy as np
+
+
+def radical_inverse(indices, base=2):
+    """
+    Return the van der Corput radical inverse of non-negative integer indices.
+
+    In base 2 this is also the first dimension of the Sobol sequence.
+    """
+    indices = np.asarray(indices, dtype=np.int64).copy()
+    result = np.zeros(indices.shape)
+    scale = 1.0
+    while np.any(indices):
+        scale /= base
+        result += (indices % base) * scale
+        indices //= base
+    return result
+
+
+def unit_samples(strategy, first, last, count, rng, index=0, shift=0.0):
+    """
+    Return samples ``[first, last)`` of a batch of ``count`` in [0, 1).
+
+    Drawing a batch in slices gives the same stratification and sequence
+    positions as drawing it at once, so shards of one batch can be sampled
+    separately, each with its own ``rng``.
+
+    :param strategy: one of RaySampler.STRATEGIES
+    :param index: position of the batch in the low-discrepancy sequence
+    :param shift: Cranley-Patterson shift of the low-discrepancy sequence
+    """
+    if strategy == "uniform":
+        return rng.random(last - first)
+    if strategy == "stratified":
+        return (np.arange(first, last) + rng.random(last - first)) / count
+    return (radical_inverse(np.arange(index + first, index + last)) + shift) % 1.0
+
+
+class RaySampler:
+    """
+    Draw y-origins for parallel rays.
+
+    Strategies:
+
+    * ``"uniform"``: independent uniform samples.
+    * ``"stratified"``: one jittered sample per equal-width stratum of each
+      batch. Batches of one ray degrade to uniform sampling.
+    * ``"halton"``: the base-2 van der Corput (1D Sobol) low-discrepancy
+      sequence, continued across batches, with a random Cranley-Patterson
+      shift so repeated runs are independent.
+
+    With ``importance=True`` samples are limited to the occluder's projected
+    y-extent. Rays outside it always miss, so estimates stay unbiased while
+    no samples are wasted.
+
+    After each ``sample`` call, ``width`` holds the length of the sampled
+    interval. Each ray then stands for ``width`` units of y when estimating
+    shadow height and area.
+    """
+
+    STRATEGIES = ("uniform", "stratified", "halton")
+
+    def __init__(self, strategy="uniform", importance=False, y_range=(-10, 10), seed=None):
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"unknown sampling strategy {strategy!r}, expected one of {self.STRATEGIES}")
+        self.strategy = strategy
+        self.importance = importance
+        self.y_range = y_range
+        self.rng = np.random.default_rng(seed)
+        self.index = 0  # Samples drawn so far, the position in the low-discrepancy sequence
+        self.shift = self.rng.random()
+        self.width = y_range[1] - y_range[0]
+
+    def interval(self, extent=None):
+        """
+        Return the (low, high) y-interval the next batch is drawn from.
+
+        :param extent: (ymin, ymax) of the occluder, used when importance is on
+        """
+        low, high = self.y_range
+        if self.importance and extent is not None:
+            low, high = max(low, extent[0]), min(high, extent[1])
+        return low, high
+
+    def sample(self, count, extent=None):
+        """
+        Return ``count`` y-origins.
+
+        :param extent: (ymin, ymax) of the occluder, used when importance is on
+        """
+        low, high = self.interval(extent)
+        self.width = high - low
+        unit = unit_samples(self.strategy, 0, count, count, self.rng, self.index, self.shift)
+        self.index += count
+        return low + unit * self.width
+
+
+class ConvergenceStats:
+    """
+    Running mean and variance of the per-ray shadow height and area estimates.
+
+    Each ray contributes ``width * hit`` to the height estimate and
+    ``width * hit * (wall_x - hit_x)`` to the area estimate. Batches are
+    merged with Chan's parallel update, so large batches cost one vectorized
+    pass. The standard errors assume independent samples. That is exact for
+    uniform sampling and conservative for stratified and low-discrepancy
+    sequences, which converge faster than it suggests.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.hits = 0
+        self._mean = np.zeros(2)  # (height, area)
+        self._m2 = np.zeros(2)
+
+    def update(self, hit_mask, lengths, width):
+        """Fold in one batch: hit mask, hit-to-wall lengths (any value for misses) and sampled width."""
+        hit_mask = np.asarray(hit_mask, dtype=bool)
+        n = len(hit_mask)
+        if n == 0:
+            return
+        height = width * hit_mask
+        area = height * np.where(hit_mask, lengths, 0.0)
+        samples = np.stack((height, area), axis=1)
+
+        batch_mean = samples.mean(axis=0)
+        batch_m2 = ((samples - batch_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = batch_mean - self._mean
+        self._mean = self._mean + delta * n / total
+        self._m2 = self._m2 + batch_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.hits += int(np.count_nonzero(hit_mask))
+
+    def _variance(self):
+        return self._m2 / (self.count - 1) if self.count > 1 else np.full(2, np.inf)
+
+    @property
+    def height(self):
+        """Estimated height of the shadow band."""
+        return float(self._mean[0])
+
+    @property
+    def area(self):
+        """Estimated shadow area between the silhouette and the wall."""
+        return float(self._mean[1])
+
+    @property
+    def height_variance(self):
+        return float(self._variance()[0])
+
+    @property
+    def area_variance(self):
+        return float(self._variance()[1])
+
+    @property
+    def height_error(self):
+        """Standard error of the height estimate."""
+        return float(np.sqrt(self.height_variance / max(self.count, 1)))
+
+    @property
+    def area_error(self):
+        """Standard error of the area estimate."""
+        return float(np.sqrt(self.area_variance / max(self.count, 1)))
+
+    @property
+    def relative_area_error(self):
+        """Standard error of the area estimate relative to the estimate."""
+        return self.area_error / self.area if self.area else float("inf")
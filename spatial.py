@@ -0,0 +1,137 @@
+"""Uniform-grid spatial index mapping sample points to candidate occluders."""
+
+import numpy as np
+
+
+class UniformGrid:
+    """
+    Bucket items by the grid cells their bounding boxes overlap.
+
+    The index is a flat list of (cell, item) pairs sorted by cell, plus a
+    per-cell offset table that is rebuilt lazily. ``update`` only touches items
+    whose covered cell range changed, merging their new pairs in with one
+    ``np.insert``. Items that move within the cells they already cover cost
+    nothing.
+
+    Points and boxes outside ``bounds`` are clamped to the border cells. A
+    box reaching past the border covers the border cells, so clamped points
+    still find it.
+
+    :param bounds: (min_x, min_y, max_x, max_y) of the indexed region
+    :param cell_size: edge length of a square cell
+    :param max_cells: upper limit on the cell count, cells grow to respect it
+    """
+
+    def __init__(self, bounds, cell_size, max_cells=1 << 20):
+        self.bounds = tuple(float(b) for b in bounds)
+        x0, y0, x1, y1 = self.bounds
+        cell_size = max(float(cell_size), np.sqrt((x1 - x0) * (y1 - y0) / max_cells))
+        self.cell_size = cell_size
+        self.nx = max(1, int(np.ceil((x1 - x0) / cell_size)))
+        self.ny = max(1, int(np.ceil((y1 - y0) / cell_size)))
+        self.cells = np.empty(0, dtype=np.int64)  # Sorted cell of every pair
+        self.items = np.empty(0, dtype=np.int64)  # Item of every pair
+        self.ranges = np.empty((0, 4), dtype=np.int64)  # Per-item (ix0, iy0, ix1, iy1), -1 when absent
+        self._starts = None
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _cell_coords(self, xy):
+        x0, y0 = self.bounds[:2]
+        ix = np.clip(((xy[..., 0] - x0) / self.cell_size).astype(np.int64), 0, self.nx - 1)
+        iy = np.clip(((xy[..., 1] - y0) / self.cell_size).astype(np.int64), 0, self.ny - 1)
+        return ix, iy
+
+    def cell_ranges(self, bboxes):
+        """Return (n, 4) inclusive (ix0, iy0, ix1, iy1) cell ranges of (n, 4) bounding boxes."""
+        bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+        ix0, iy0 = self._cell_coords(bboxes[:, :2])
+        ix1, iy1 = self._cell_coords(bboxes[:, 2:])
+        return np.column_stack((ix0, iy0, ix1, iy1))
+
+    @property
+    def starts(self):
+        """(nx * ny + 1,) offsets of every cell's run in the pair arrays."""
+        if self._starts is None:
+            self._starts = np.searchsorted(self.cells, np.arange(self.nx * self.ny + 1))
+        return self._starts
+
+    def update(self, ids, bboxes):
+        """Insert items or move them to new bounding boxes."""
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if len(ids) == 0:
+            return
+        if ids.max() >= len(self.ranges):
+            grown = np.full((ids.max() + 1, 4), -1, dtype=np.int64)
+            grown[:len(self.ranges)] = self.ranges
+            self.ranges = grown
+
+        ranges = self.cell_ranges(bboxes)
+        changed = np.any(ranges != self.ranges[ids], axis=1)
+        if not changed.any():
+            return
+        ids, ranges = ids[changed], ranges[changed]
+        self._drop_pairs(ids)
+        self.ranges[ids] = ranges
+
+        # Enumerate every covered cell of every changed item in one pass
+        widths = ranges[:, 2] - ranges[:, 0] + 1
+        heights = ranges[:, 3] - ranges[:, 1] + 1
+        per_item = widths * heights
+        owner = np.repeat(np.arange(len(ids)), per_item)
+        local = np.arange(per_item.sum()) - np.repeat(np.cumsum(per_item) - per_item, per_item)
+        ix = ranges[owner, 0] + local % widths[owner]
+        iy = ranges[owner, 1] + local // widths[owner]
+        cells = ix * self.ny + iy
+
+        order = np.argsort(cells, kind="stable")
+        cells, items = cells[order], ids[owner][order]
+        positions = np.searchsorted(self.cells, cells, side="right")
+        self.cells = np.insert(self.cells, positions, cells)
+        self.items = np.insert(self.items, positions, items)
+        self._starts = None
+
+    def remove(self, ids):
+        """Drop items from the index."""
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        ids = ids[ids < len(self.ranges)]
+        self._drop_pairs(ids)
+        self.ranges[ids] = -1
+
+    def _drop_pairs(self, ids):
+        present = ids[self.ranges[ids, 0] >= 0]
+        if len(present):
+            keep = ~np.isin(self.items, present)
+            self.cells, self.items = self.cells[keep], self.items[keep]
+            self._starts = None
+
+    def query_points(self, points):
+        """
+        Return candidate (point index, item) pairs for an (N, 2) array of points.
+
+        Every item whose bounding box contains a point is among that point's
+        candidates; the caller still runs the exact test.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        ix, iy = self._cell_coords(points)
+        cells = ix * self.ny + iy
+        starts = self.starts
+        begin = starts[cells]
+        counts = starts[cells + 1] - begin
+        total = int(counts.sum())
+        point_index = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        return point_index, self.items[np.repeat(begin, counts) + offsets]
+
+    def stats(self):
+        """Return cell counts and occupancy figures for tuning ``cell_size``."""
+        occupancy = np.diff(self.starts)
+        occupied = occupancy[occupancy > 0]
+        return {
+            "cells": self.nx * self.ny,
+            "pairs": len(self.cells),
+            "occupied_cells": len(occupied),
+            "mean_items_per_occupied_cell": float(occupied.mean()) if len(occupied) else 0.0,
+            "max_items_per_cell": int(occupancy.max()) if len(occupancy) else 0,
+        }
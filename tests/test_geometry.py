@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from geometry import lit_silhouette, shadow_area
+
+
+def left_boundary(vertices, ys):
+    """Smallest x of the polygon at every y, by intersecting every edge."""
+    v = np.asarray(vertices, dtype=float)
+    a, b = v, np.roll(v, -1, axis=0)
+    xs = np.full(len(ys), np.inf)
+    for (x0, y0), (x1, y1) in zip(a, b):
+        if y0 == y1:
+            continue
+        t = (ys - y0) / (y1 - y0)
+        on_edge = (t >= 0) & (t <= 1)
+        xs = np.where(on_edge, np.minimum(xs, x0 + t * (x1 - x0)), xs)
+    return xs
+
+
+SLANTED = [(0, 0), (50, 0.2), (100, 1), (90, 0.99)]
+
+
+@pytest.mark.parametrize("vertices", [
+    SLANTED,
+    SLANTED[::-1],
+    [(0, 0), (4, -3), (9, 1), (7, 6), (1, 5)],
+    [(-3, -3), (3, -3), (3, 3), (-3, 3)],
+])
+def test_lit_silhouette_matches_left_boundary(vertices):
+    wall_x = 200
+    silhouette = lit_silhouette(vertices)
+    assert np.all(np.diff(silhouette[:, 1]) >= 0)
+
+    ys = np.linspace(silhouette[0, 1], silhouette[-1, 1], 20001)
+    xs = left_boundary(vertices, ys)
+    np.testing.assert_allclose(np.interp(ys, silhouette[:, 1], silhouette[:, 0]), xs, atol=1e-9)
+    widths = wall_x - xs
+    expected = np.sum(0.5 * (widths[1:] + widths[:-1]) * np.diff(ys))
+    assert shadow_area(silhouette, wall_x) == pytest.approx(expected, rel=1e-6)
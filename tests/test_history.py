@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from history import RingBuffer
+
+
+@pytest.mark.parametrize("capacity", [1, 2, 7, 16])
+def test_oldest_keeps_the_newest_items(capacity):
+    rng = np.random.default_rng(capacity)
+    buffer = RingBuffer(capacity, policy="oldest")
+    appended = []
+    for size in rng.integers(0, 2 * capacity + 2, 50):
+        items = np.arange(len(appended), len(appended) + size, dtype=float)
+        buffer.extend(items)
+        appended.extend(items)
+        np.testing.assert_array_equal(buffer.view(), appended[-capacity:])
+
+
+@pytest.mark.parametrize("capacity", [2, 3, 8, 13])
+def test_decimate_keeps_every_stride_th_item(capacity):
+    rng = np.random.default_rng(capacity)
+    buffer = RingBuffer(capacity, policy="decimate")
+    appended = 0
+    for size in rng.integers(0, 3 * capacity, 50):
+        buffer.extend(np.arange(appended, appended + size, dtype=float))
+        appended += size
+        # Decimation always keeps the items whose index is a multiple of the stride
+        np.testing.assert_array_equal(buffer.view(), np.arange(0, appended, buffer.stride))
+        assert len(buffer) <= capacity
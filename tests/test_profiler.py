@@ -0,0 +1,28 @@
+import sys
+import threading
+
+from profiler import FrameProfiler
+
+
+def test_percentiles_while_another_thread_records():
+    profiler = FrameProfiler(window=50, trace_limit=1000)
+
+    def worker():
+        for i in range(20000):
+            profiler.record(f"phase{i % 500}", 0, i)  # Keeps adding new phase names
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads often enough to hit a mid-iteration insert
+    thread = threading.Thread(target=worker)
+    thread.start()
+    try:
+        while thread.is_alive():
+            profiler.percentiles()
+            profiler.chrome_trace()
+    finally:
+        thread.join()
+        sys.setswitchinterval(interval)
+
+    assert len(profiler.percentiles()) == 500
+    tids = {event["tid"] for event in profiler.chrome_trace()["traceEvents"]}
+    assert tids == {thread.native_id}
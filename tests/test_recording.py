@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from recording import FrameArchive, FrameRecorder
+
+
+def test_rerecording_replaces_only_the_archive_files(tmp_path):
+    with FrameRecorder(str(tmp_path), chunk_frames=2) as recorder:
+        for i in range(5):
+            recorder.record(points=np.full((i, 2), i, dtype=np.float32), step=i)
+    (tmp_path / "notes.bin").write_bytes(b"keep")
+
+    with FrameRecorder(str(tmp_path)) as recorder:
+        recorder.record(step=7)
+
+    assert (tmp_path / "notes.bin").read_bytes() == b"keep"
+    assert not (tmp_path / "points.bin").exists()
+    archive = FrameArchive(str(tmp_path))
+    assert len(archive) == 1
+    assert archive[0]["step"] == 7
+
+
+def test_refuses_a_directory_without_a_manifest(tmp_path):
+    (tmp_path / "data.bin").write_bytes(b"not ours")
+    with pytest.raises(ValueError):
+        FrameRecorder(str(tmp_path))
+    assert (tmp_path / "data.bin").read_bytes() == b"not ours"
+
+
+def test_new_field_ignores_leftover_files(tmp_path):
+    with FrameRecorder(str(tmp_path)) as recorder:
+        recorder.record(step=0)
+    (tmp_path / "points.idx").write_bytes(np.arange(3, dtype=np.int64).tobytes())  # Interrupted before a flush
+
+    with FrameRecorder(str(tmp_path)) as recorder:
+        recorder.record(step=0)
+        recorder.record(step=1, points=np.ones((2, 2)))
+
+    points, offsets = FrameArchive(str(tmp_path)).field("points")
+    assert len(points) == 2
+    assert list(offsets) == [0, 0, 2]
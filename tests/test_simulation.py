@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from Simulation import SamplePool, Scene, Square
+
+
+@pytest.mark.parametrize("speed", [1, 7, -3, 50])
+def test_sample_pool_matches_a_full_classification(speed):
+    rng = np.random.default_rng(speed % 17)
+    square = Square(side_length=8, rotation=10, rotation_speed=speed)
+    points = rng.uniform(-10, 10, (4000, 2))
+    pool = SamplePool(square, points, 0.05, rng)
+    for step in range(60):
+        square.update_rotation()
+        if step == 20:
+            square.rotation += np.radians(80)  # A jump rather than a steady turn
+        if step == 40:
+            square.center = (1, -1)  # Moving the square reclassifies everything
+        inside = pool.step()
+        np.testing.assert_array_equal(inside, square.contains_points(points))
+    assert pool.reclassified < len(points)
+
+
+def test_sample_pool_falls_back_to_full_classification_for_scenes():
+    rng = np.random.default_rng(0)
+    scene = Scene.random(20, seed=1)
+    points = rng.uniform(-10, 10, (2000, 2))
+    pool = SamplePool(scene, points, 0.1, rng)
+    for _ in range(10):
+        scene.update_rotation()
+        np.testing.assert_array_equal(pool.step(), scene.contains_points(points))
@@ -0,0 +1,52 @@
+import numpy as np
+
+from spatial import UniformGrid
+
+
+def random_bboxes(rng, count):
+    corners = rng.uniform(-12, 12, (count, 2))  # Some reach past the bounds
+    return np.hstack((corners, corners + rng.uniform(0, 4, (count, 2))))
+
+
+def linear_candidates(grid, live, bboxes, points):
+    """Every (point, item) pair whose covered cells include the point's cell, by scanning all items."""
+    ix, iy = grid._cell_coords(points)
+    ranges = grid.cell_ranges(bboxes)
+    pairs = set()
+    for item in live:
+        x0, y0, x1, y1 = ranges[item]
+        for point in np.flatnonzero((ix >= x0) & (ix <= x1) & (iy >= y0) & (iy <= y1)):
+            pairs.add((point, item))
+    return pairs
+
+
+def test_query_points_matches_a_linear_scan():
+    rng = np.random.default_rng(0)
+    grid = UniformGrid((-10, -10, 10, 10), 1.5)
+    bboxes = random_bboxes(rng, 60)
+    grid.update(np.arange(60), bboxes)
+    live = set(range(60))
+    points = rng.uniform(-11, 11, (500, 2))
+
+    for _ in range(5):
+        moved = rng.choice(60, 15, replace=False)
+        bboxes[moved] = random_bboxes(rng, 15)
+        grid.update(moved, bboxes[moved])  # Also reinserts removed ones
+        live |= set(moved.tolist())
+        removed = rng.choice(60, 5, replace=False)
+        grid.remove(removed)
+        live -= set(removed.tolist())
+        restored = rng.choice(removed, 2, replace=False)
+        grid.update(restored, bboxes[restored])
+        live |= set(restored.tolist())
+
+        point_index, items = grid.query_points(points)
+        candidates = set(zip(point_index.tolist(), items.tolist()))
+        assert len(candidates) == len(items)  # No duplicates
+        assert candidates == linear_candidates(grid, live, bboxes, points)
+
+        # Every box containing a point is among its candidates
+        for item in live:
+            x0, y0, x1, y1 = bboxes[item]
+            inside = (points[:, 0] >= x0) & (points[:, 0] <= x1) & (points[:, 1] >= y0) & (points[:, 1] <= y1)
+            assert all((point, item) in candidates for point in np.flatnonzero(inside))
@@ -0,0 +1,58 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from Subspace import BVH, Cube, CubeInstances, moller_trumbore, quaternions_to_matrices
+
+AXES = [np.array(axis, dtype=float) for axis in np.vstack((np.eye(3), -np.eye(3)))]
+
+
+@pytest.mark.parametrize("rotation", [None, quaternions_to_matrices([[0.9, 0.1, -0.3, 0.2]])[0]])
+@pytest.mark.parametrize("axis", AXES, ids=["+x", "+y", "+z", "-x", "-y", "-z"])
+def test_cube_faces_point_outward(axis, rotation):
+    cube = Cube((1, 2, 2), 4, rotation)
+    rng = np.random.default_rng(0)
+    # Rays fired from outside towards the center along each axis, slightly offset
+    origins = cube.center - 10 * axis + rng.uniform(-0.5, 0.5, (16, 3)) * (1 - np.abs(axis))
+    t, _, _ = cube.intersect_rays(origins, axis)
+    culled, _, _ = cube.intersect_rays(origins, axis, cull_backfaces=True)
+    assert np.all(np.isfinite(t))
+    np.testing.assert_allclose(culled, t)
+    if rotation is None:
+        np.testing.assert_allclose(t, 8.0)  # 10 to the center minus half the size
+
+
+def test_axis_aligned_rays_emit_no_warnings():
+    cube = Cube((0, 0, 0), 2)
+    origins = np.array([[-5.0, 0.2, 0.3], [0.1, -5.0, 0.0], [0.0, 0.0, -5.0]])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        t, _, _ = cube.intersect_rays(origins, np.eye(3))
+    np.testing.assert_allclose(t, 4.0)
+
+
+@pytest.mark.parametrize("method", ["sah", "median"])
+@pytest.mark.parametrize("cull_backfaces", [False, True])
+def test_bvh_matches_moller_trumbore_over_all_triangles(method, cull_backfaces):
+    scene = CubeInstances.random(40, center_range=(-8, 8), seed=2).to_shape()
+    bvh = BVH(scene, method=method)
+    rng = np.random.default_rng(3)
+    origins = rng.uniform(-12, 12, (600, 3))
+    directions = rng.normal(size=(600, 3))
+    directions[:100] = np.eye(3)[rng.integers(0, 3, 100)]  # Axis-parallel rays hit the slab test's edge cases
+
+    t, triangle, _ = bvh.intersect_rays(origins, directions, cull_backfaces=cull_backfaces)
+
+    tris = bvh.mesh.triangle_array()
+    v0 = tris[:, 0]
+    brute, _, _ = moller_trumbore(
+        origins[:, None], directions[:, None], v0, tris[:, 1] - v0, tris[:, 2] - v0, cull_backfaces
+    )
+    nearest = brute.min(axis=1)
+    np.testing.assert_allclose(t, nearest)
+    hit = np.isfinite(nearest)
+    assert hit.any() and not hit.all()
+    # Ties on shared edges may pick either triangle, but the chosen one must be that close
+    np.testing.assert_allclose(brute[hit, triangle[hit]], nearest[hit])
+    assert np.all(triangle[~hit] == -1)
@@ -0,0 +1,60 @@
+import importlib
+
+import numpy as np
+import pytest
+
+TRACERS = ["2drender", "2drender copy"]
+
+
+@pytest.mark.parametrize("name", TRACERS)
+def test_sample_until_casts_rays_in_analytic_mode(name):
+    render = importlib.import_module(name)
+    ray_tracer = render.MonteCarloRayTracer(render.Square(), analytic=True, seed=1)
+    assert ray_tracer.sample_until(0.05, batch=1024, max_rays=10 ** 6)
+    assert 0 < ray_tracer.rays_cast <= 10 ** 6
+
+
+def random_pairs(rng, count):
+    y = rng.uniform(-10, 10, count)
+    return np.stack((np.column_stack((rng.uniform(-3, 3, count), y)), np.column_stack((np.full(count, 10.0), y))), 1)
+
+
+@pytest.mark.parametrize("capacity", [None, 1, 40])
+def test_strip_mesh_matches_a_sorted_strip(capacity):
+    StripMesh = importlib.import_module("2drender copy").StripMesh
+    rng = np.random.default_rng(0)
+    mesh = StripMesh(merge=False, capacity=capacity)
+    inserted = np.empty((0, 2, 2))
+    for size in rng.integers(0, 30, 20):
+        hits = random_pairs(rng, size)
+        mesh.insert(hits)
+        inserted = np.concatenate((inserted, hits))
+        kept = inserted if capacity is None else inserted[-capacity:]
+        expected = kept[np.argsort(kept[:, 0, 1])]
+        np.testing.assert_array_equal(mesh.strip(), expected.reshape(-1, 2))
+
+
+def test_strip_mesh_merging_keeps_the_area():
+    StripMesh = importlib.import_module("2drender copy").StripMesh
+    rng = np.random.default_rng(1)
+    y = rng.uniform(-5, 5, 200)
+    hits = np.stack((np.column_stack((0.5 * y, y)), np.column_stack((np.full(200, 10.0), y))), 1)  # One straight edge
+    merged, full = StripMesh(merge=True), StripMesh(merge=False)
+    for chunk in np.array_split(hits, 10):
+        merged.insert(chunk)
+        full.insert(chunk)
+    assert len(merged) == 2
+    assert merged.area() == pytest.approx(full.area())
+
+
+@pytest.mark.parametrize("merge", [False, True])
+def test_strip_mesh_changes_keep_the_unchanged_prefix(merge):
+    StripMesh = importlib.import_module("2drender copy").StripMesh
+    rng = np.random.default_rng(2)
+    mesh = StripMesh(merge=merge, capacity=50)
+    uploaded = np.empty((0, 2))
+    for size in rng.integers(1, 10, 40):
+        mesh.insert(random_pairs(rng, size))
+        first, strip = mesh.changes()
+        np.testing.assert_array_equal(strip[:first], uploaded[:first])
+        uploaded = strip.copy()
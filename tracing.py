@@ -0,0 +1,212 @@
+"""
+Scene and headless drivers shared by the two Monte Carlo ray tracers.
+
+2drender.py and "2drender copy.py" differ in how they store and draw the
+shadow, not in what they trace: both cast parallel rays at the same square
+towards the same backboard, record and replay runs the same way and run
+headless the same way. ``replay`` and ``run_headless`` take the calling
+program's MonteCarloRayTracer class, and each program binds it with
+functools.partial.
+"""
+
+import time
+
+import numpy as np
+
+from geometry import lit_silhouette, polygon_segments, rotation_matrix
+from lazy import LazyModule
+from recording import FrameArchive, FrameRecorder
+from sampling import RaySampler
+
+gl = LazyModule("OpenGL.GL")  # Only imported once something draws
+
+WALL_X = 10  # Backboard position
+RIGHT_WALL = np.array([[[WALL_X, -10], [WALL_X, 10]]])  # Backboard segment at x = 10
+
+
+class Square:
+    def __init__(self, side_length=6, center=(0, 0), rotation=30):
+        self._side_length = side_length
+        self._center = np.array(center)
+        self._rotation = np.radians(rotation)
+        self._cache = {}  # Derived geometry, rebuilt on first access after a change
+
+    def _cached(self, name, build):
+        value = self._cache.get(name)
+        if value is None:
+            value = self._cache[name] = build()
+        return value
+
+    @property
+    def rotation(self):
+        return self._rotation
+
+    @rotation.setter
+    def rotation(self, rotation):
+        self._rotation = rotation
+        self._cache = {}
+
+    @property
+    def center(self):
+        return self._center
+
+    @center.setter
+    def center(self, center):
+        self._center = np.array(center)
+        self._cache = {}
+
+    @property
+    def side_length(self):
+        return self._side_length
+
+    @side_length.setter
+    def side_length(self, side_length):
+        self._side_length = side_length
+        self._cache = {}
+
+    @property
+    def vertices(self):
+        return self._cached("vertices", self.generate_vertices)
+
+    @property
+    def edges(self):
+        """Shapely LineStrings for the square edges."""
+        from shapely.geometry import LineString
+
+        return self._cached("edges", lambda: [
+            LineString([self.vertices[i], self.vertices[(i + 1) % 4]])
+            for i in range(4)
+        ])
+
+    @property
+    def segments(self):
+        """(4, 2, 2) edge array for batched casting."""
+        return self._cached("segments", lambda: polygon_segments(self.vertices))
+
+    @property
+    def bbox(self):
+        """(min_x, min_y, max_x, max_y) of the rotated square."""
+        return self._cached("bbox", lambda: (*self.vertices.min(axis=0), *self.vertices.max(axis=0)))
+
+    def generate_vertices(self):
+        """Generate square vertices given side length, center, and rotation."""
+        half_side = self.side_length / 2
+        square = np.array([
+            [-half_side, -half_side],
+            [ half_side, -half_side],
+            [ half_side,  half_side],
+            [-half_side,  half_side]
+        ])
+
+        # Apply rotation and translation
+        rotated_square = (square @ rotation_matrix(self.rotation).T) + self.center
+
+        return rotated_square
+
+    def get_edges(self):
+        """Return Shapely LineStrings for square edges, cached until the square changes."""
+        return self.edges
+
+    def lit_silhouette(self):
+        """Return the edge chain hit first by rightward rays, ordered by increasing y."""
+        return lit_silhouette(self.vertices)
+
+    def draw(self):
+        """Draw the square using OpenGL."""
+        gl.glColor3f(1, 1, 1)  # White color
+        gl.glBegin(gl.GL_LINE_LOOP)
+        for vertex in self.vertices:
+            gl.glVertex2f(vertex[0], vertex[1])
+        gl.glEnd()
+
+
+def recording_metadata(square):
+    """Manifest metadata needed to rebuild the scene of a recording."""
+    return {
+        "kind": "rays",
+        "square": {
+            "side_length": float(square.side_length),
+            "center": [float(c) for c in square.center],
+            "rotation": float(np.degrees(square.rotation)),
+        },
+    }
+
+
+def replay(tracer_class, path, start=0, stop=None, ray_tracer=None):
+    """
+    Feed recorded batches [start, stop) back through a tracer without a window.
+
+    Only the frames in the range are read from the memory-mapped archive.
+
+    :param tracer_class: MonteCarloRayTracer class of the calling program
+    :param ray_tracer: tracer to replay into, by default a new one over the
+        recorded square with room for every replayed ray
+    :return: the tracer, with stores and estimates as they were after those batches
+    """
+    archive = FrameArchive(path)
+    if ray_tracer is None:
+        rays, _ = archive.field("rays", start, stop)
+        ray_tracer = tracer_class(Square(**archive.metadata["square"]), capacity=max(len(rays), 1))
+    for step in archive.frame_range(start, stop):
+        ray_tracer.replay_step(step)
+    return ray_tracer
+
+
+def run_headless(tracer_class, steps=1000, rays_per_step=1, seed=None, workers=None, strategy="uniform",
+                 importance=False, record=None):
+    """
+    Cast rays with no window, no GL and no frame cap.
+
+    :param tracer_class: MonteCarloRayTracer class of the calling program
+    :param steps: number of ray batches to cast
+    :param rays_per_step: rays cast in each batch
+    :param seed: seed for reproducible runs
+    :param workers: cast each batch across this many processes with a
+        ParallelRaySampler instead of in this process
+    :param strategy: RaySampler strategy for ray origins
+    :param importance: only sample the square's projected y-extent
+    :param record: archive directory every batch is recorded to
+    :return: dict of per-step arrays shaped (steps, rays_per_step, ...):
+        "origin_y", "hit", "square_hits" and "wall_hits" (nan where missed),
+        plus the final "shadow_error" report, "elapsed" seconds and
+        "steps_per_second"
+    """
+    results = {
+        "origin_y": np.empty((steps, rays_per_step)),
+        "hit": np.empty((steps, rays_per_step), dtype=bool),
+        "square_hits": np.empty((steps, rays_per_step, 2)),
+        "wall_hits": np.empty((steps, rays_per_step, 2)),
+    }
+
+    square = Square(side_length=6, center=(0, 0), rotation=30)
+    ray_tracer = tracer_class(square, sampler=RaySampler(strategy, importance, seed=seed))
+    if record is not None:
+        ray_tracer.recorder = FrameRecorder(record, metadata=recording_metadata(square))
+    if workers:
+        from parallel import ParallelRaySampler  # Process pools are only imported when asked for
+
+        sampler = ParallelRaySampler(ray_tracer, RIGHT_WALL, workers=workers, seed=seed)
+        cast = sampler.sample
+    else:
+        sampler = None
+        cast = ray_tracer.add_rays
+
+    start = time.perf_counter()
+    try:  # The pool and its shared memory must go even if casting fails
+        for step in range(steps):
+            rays, square_hits, wall_hits, hit_mask = cast(rays_per_step)
+            results["origin_y"][step] = rays[:, 0, 1]
+            results["hit"][step] = hit_mask
+            results["square_hits"][step] = np.where(hit_mask[:, None], square_hits, np.nan)
+            results["wall_hits"][step] = np.where(hit_mask[:, None], wall_hits, np.nan)
+    finally:
+        if sampler is not None:
+            sampler.close()
+        if ray_tracer.recorder is not None:
+            ray_tracer.recorder.close()
+    elapsed = time.perf_counter() - start
+
+    results["shadow_error"] = ray_tracer.shadow_error()
+    results["elapsed"] = elapsed
+    results["steps_per_second"] = steps / elapsed if elapsed > 0 else float("inf")
+    return results